@@ -0,0 +1,285 @@
+"""
+ID Card Perceptual Hash Index
+- 256-bit DCT perceptual hash of a normalized (cropped, deskewed) card, so
+  two photos of the same physical card land a few bits apart
+- Persistent SQLite store with an in-memory multi-index hash on top: the
+  hash is split into 16 chunks of 16 bits, and any card within Hamming
+  distance d of a query shares at least one chunk within d // 16 bits of
+  it, so a lookup probes a few hundred sorted buckets instead of every card
+- Cards added by other processes are picked up on the next lookup; a
+  card is stored once per ref (the account or file it came from)
+- Used by id_card_scanner.scan_image to report the closest cards seen
+  before (the index lives at id_card_scanner.CARD_HASH_INDEX_PATH unless
+  --index is given); the CLI bulk-indexes historical scans:
+    python scripts/card_hash_index.py build <dir|manifest> [--index PATH] [--workers N]
+    python scripts/card_hash_index.py query <image> [--index PATH] [--limit K]
+  A manifest line is an image path or {"image": ..., "ref": ..., "student_id": ...};
+  the verify route only treats refs that are account ids as duplicates.
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from itertools import combinations
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+HASH_SIDE = 16
+HASH_BYTES = HASH_SIDE * HASH_SIDE // 8
+DCT_SIDE = 64
+CHUNK_BITS = 16
+CHUNKS = HASH_SIDE * HASH_SIDE // CHUNK_BITS
+REBUILD_THRESHOLD = 1024
+
+CARD_HASH_MAX_DISTANCE = int(os.environ.get("CARD_HASH_MAX_DISTANCE", "31"))
+CARD_HASH_LIMIT = 5
+
+POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+ROTATIONS = (None, cv2.ROTATE_90_CLOCKWISE, cv2.ROTATE_180, cv2.ROTATE_90_COUNTERCLOCKWISE)
+
+
+def card_hash(image: np.ndarray) -> bytes:
+    # Low-frequency DCT coefficients against their median: robust to blur,
+    # noise, JPEG and lighting, but not to rotation (see rotation_hashes).
+    gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (DCT_SIDE, DCT_SIDE), interpolation=cv2.INTER_AREA).astype(np.float32)
+    coefficients = cv2.dct(small)[:HASH_SIDE, :HASH_SIDE].flatten()
+    return np.packbits(coefficients > np.median(coefficients[1:])).tobytes()
+
+
+def rotation_hashes(image: np.ndarray) -> list[bytes]:
+    # The normalized card may still be upside down or sideways; querying all
+    # four rotations finds it whichever way either photo was taken.
+    return [card_hash(image if code is None else cv2.rotate(image, code)) for code in ROTATIONS]
+
+
+@lru_cache(maxsize=None)
+def chunk_masks(radius: int) -> np.ndarray:
+    masks = [0]
+    for flips in range(1, radius + 1):
+        for bits in combinations(range(CHUNK_BITS), flips):
+            masks.append(sum(1 << bit for bit in bits))
+    return np.array(masks, dtype=np.uint16)
+
+
+def hamming(hashes: np.ndarray, query: np.ndarray) -> np.ndarray:
+    return POPCOUNT[np.bitwise_xor(hashes, query)].sum(axis=1, dtype=np.int32)
+
+
+@dataclass
+class CardMatch:
+    ref: str | None
+    student_id: str | None
+    distance: int
+    created_at: float
+
+
+class CardHashIndex:
+    """Nearest-card lookups over every card hash stored at path."""
+
+    def __init__(self, path: str):
+        # Refs are account ids; like the scan cache, the file is owner-only.
+        Path(path).parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        os.close(os.open(path, os.O_RDWR | os.O_CREAT, 0o600))
+        os.chmod(path, 0o600)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS cards (
+                id INTEGER PRIMARY KEY,
+                hash BLOB NOT NULL,
+                ref TEXT,
+                student_id TEXT,
+                created_at REAL NOT NULL,
+                UNIQUE (hash, ref)
+            )
+            """
+        )
+        self._db.commit()
+        self._ids = np.empty(0, dtype=np.int64)
+        self._hashes = np.empty((0, HASH_BYTES), dtype=np.uint8)
+        self._refs: list[str | None] = []
+        self._tables: list[tuple[np.ndarray, np.ndarray]] = []
+        self._indexed = 0
+        self._last_id = 0
+        self._refresh()
+
+    def __len__(self) -> int:
+        return len(self._refs)
+
+    def _refresh(self) -> None:
+        # Pull rows added since the last look (by any process). They are
+        # scanned linearly until there are enough to re-sort the chunk tables.
+        rows = self._db.execute(
+            "SELECT id, hash, ref FROM cards WHERE id > ? ORDER BY id", (self._last_id,)
+        ).fetchall()
+        if not rows:
+            return
+        self._ids = np.concatenate([self._ids, np.array([row[0] for row in rows], dtype=np.int64)])
+        fresh = np.frombuffer(b"".join(row[1] for row in rows), dtype=np.uint8).reshape(-1, HASH_BYTES)
+        self._hashes = np.concatenate([self._hashes, fresh])
+        self._refs.extend(row[2] for row in rows)
+        self._last_id = rows[-1][0]
+        if len(self._refs) - self._indexed >= REBUILD_THRESHOLD:
+            self._build()
+
+    def _build(self) -> None:
+        chunks = self._hashes.view("<u2")
+        self._tables = []
+        for position in range(CHUNKS):
+            order = np.argsort(chunks[:, position], kind="stable")
+            self._tables.append((chunks[order, position], order))
+        self._indexed = len(self._refs)
+
+    def _candidates(self, query: np.ndarray, radius: int) -> np.ndarray:
+        masks = chunk_masks(radius)
+        found = [np.arange(self._indexed, len(self._refs))]
+        for position, (values, order) in enumerate(self._tables):
+            probes = np.bitwise_xor(query.view("<u2")[position], masks)
+            starts = np.searchsorted(values, probes, side="left")
+            ends = np.searchsorted(values, probes, side="right")
+            found.extend(order[start:end] for start, end in zip(starts, ends) if end > start)
+        return np.unique(np.concatenate(found))
+
+    def nearest(
+        self,
+        hashes: list[bytes],
+        limit: int = CARD_HASH_LIMIT,
+        max_distance: int = CARD_HASH_MAX_DISTANCE,
+        exclude_ref: str | None = None,
+    ) -> list[CardMatch]:
+        radius = max_distance // CHUNKS
+        with self._lock:
+            self._refresh()
+            best: dict[int, int] = {}
+            for card in hashes:
+                query = np.frombuffer(card, dtype=np.uint8)
+                rows = self._candidates(query, radius)
+                if not len(rows):
+                    continue
+                for row, distance in zip(rows.tolist(), hamming(self._hashes[rows], query).tolist()):
+                    if distance <= max_distance and (exclude_ref is None or self._refs[row] != exclude_ref):
+                        best[row] = min(distance, best.get(row, distance))
+            ranked = sorted(best.items(), key=lambda item: item[1])[:limit]
+            matches = []
+            for row, distance in ranked:
+                ref, student_id, created_at = self._db.execute(
+                    "SELECT ref, student_id, created_at FROM cards WHERE id = ?", (int(self._ids[row]),)
+                ).fetchone()
+                matches.append(CardMatch(ref, student_id, distance, created_at))
+        return matches
+
+    def add(self, card: bytes, ref: str | None = None, student_id: str | None = None) -> None:
+        self.add_many([(card, ref, student_id)])
+
+    def add_many(self, cards: list[tuple[bytes, str | None, str | None]]) -> None:
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR IGNORE INTO cards (hash, ref, student_id, created_at) VALUES (?, ?, ?, ?)",
+                [(card, ref, student_id, now) for card, ref, student_id in cards],
+            )
+            self._db.commit()
+            self._refresh()
+
+
+def iter_build_entries(source: str):
+    import id_card_scanner
+
+    root = Path(source)
+    if root.is_dir():
+        for image_path, _ in id_card_scanner.iter_batch_images(source):
+            yield {"image": image_path, "ref": image_path}
+        return
+    if not root.exists():
+        raise RuntimeError("Batch source not found")
+    with root.open(encoding="utf-8") as manifest:
+        for line in manifest:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                entry = id_card_scanner.parse_manifest_line(line)
+            except RuntimeError as exc:
+                yield {"image": line, "error": str(exc)}
+                continue
+            path = Path(entry["image"])
+            entry["image"] = str(path if path.is_absolute() else root.parent / path)
+            entry.setdefault("ref", entry["image"])
+            yield entry
+
+
+def hash_entry(entry: dict) -> tuple[dict, bytes | None, str | None]:
+    import id_card_scanner
+
+    if entry.get("error"):
+        return entry, None, entry["error"]
+    try:
+        image = id_card_scanner.normalize_card(id_card_scanner.load_image(entry["image"]))
+        return entry, card_hash(image), None
+    except Exception as exc:
+        return entry, None, str(exc) or exc.__class__.__name__
+
+
+def build_index(source: str, index_path: str, workers: int, stream_err=sys.stderr) -> dict:
+    # Hashing (decode + card crop) is the slow part and runs across worker
+    # processes; rows are written in batches from this process.
+    started = time.perf_counter()
+    index = CardHashIndex(index_path)
+    indexed = failed = 0
+    batch: list[tuple[bytes, str | None, str | None]] = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for entry, card, error in pool.map(hash_entry, iter_build_entries(source), chunksize=16):
+            if card is None:
+                failed += 1
+                stream_err.write(json.dumps({"image": entry["image"], "error": error}) + "\n")
+                continue
+            batch.append((card, entry.get("ref"), entry.get("student_id")))
+            if len(batch) >= 500:
+                index.add_many(batch)
+                indexed += len(batch)
+                batch = []
+    if batch:
+        index.add_many(batch)
+        indexed += len(batch)
+    summary = {"indexed": indexed, "failed": failed, "cards": len(index), "seconds": round(time.perf_counter() - started, 3)}
+    stream_err.write(json.dumps({"summary": summary}) + "\n")
+    return summary
+
+
+def option_value(args: list[str], name: str, default: str | None = None) -> str | None:
+    if name not in args:
+        return default
+    idx = args.index(name)
+    return args[idx + 1] if idx + 1 < len(args) else ""
+
+
+if __name__ == "__main__":
+    import id_card_scanner
+
+    args = sys.argv[1:]
+    command = args[0] if args else ""
+    index_path = option_value(args, "--index", id_card_scanner.CARD_HASH_INDEX_PATH)
+    if command == "build" and len(args) > 1:
+        build_index(args[1], index_path, int(option_value(args, "--workers", str(os.cpu_count() or 1))))
+    elif command == "query" and len(args) > 1:
+        image = id_card_scanner.normalize_card(id_card_scanner.load_image(args[1]))
+        started = time.perf_counter()
+        matches = CardHashIndex(index_path).nearest(
+            rotation_hashes(image), limit=int(option_value(args, "--limit", str(CARD_HASH_LIMIT)))
+        )
+        elapsed = round((time.perf_counter() - started) * 1000, 2)
+        print(json.dumps({"ms": elapsed, "matches": [asdict(match) for match in matches]}))
+    else:
+        print(__doc__)
+        sys.exit(2)
@@ -0,0 +1,545 @@
+"""
+ID Card Scanner Benchmark
+- Generates synthetic college, Aadhaar and PAN cards offline, writing the
+  ground-truth fields of every card to a JSONL manifest
+- Cards vary rotation, skew, blur, noise, resolution, JPEG quality and
+  layout (labels, field order, photo side, header style, optional QR); the
+  same seed always produces the same corpus
+- Runs scan_image from the working tree, a given file or any git revision
+  of id_card_scanner.py over a manifest and reports per-field and doc_type
+  accuracy, latency percentiles and Tesseract calls per card; the corpus's
+  college list is used for college snapping where the scanner supports it
+- Compares two reports and fails when accuracy dropped
+
+Usage (only OpenCV, NumPy and a local Tesseract are needed):
+  python scripts/id_card_benchmark.py generate tmp/bench --count 200 --seed 7
+  python scripts/id_card_benchmark.py run tmp/bench/manifest.jsonl --rev HEAD~1 --output tmp/bench/base.json
+  python scripts/id_card_benchmark.py run tmp/bench/manifest.jsonl --output tmp/bench/head.json
+  python scripts/id_card_benchmark.py compare tmp/bench/base.json tmp/bench/head.json
+  python scripts/id_card_benchmark.py run tmp/bench/manifest.jsonl --ocr-backend tesserocr --output tmp/bench/tesserocr.json
+"""
+
+import importlib.util
+import inspect
+import json
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+SCANNER_PATH = Path(__file__).with_name("id_card_scanner.py")
+SCANNER_SIBLINGS = (Path(__file__).with_name("card_hash_index.py"),)
+
+CARD_SIZE = (1011, 638)
+FONTS = (cv2.FONT_HERSHEY_SIMPLEX, cv2.FONT_HERSHEY_DUPLEX, cv2.FONT_HERSHEY_TRIPLEX)
+KINDS = ("college", "college", "aadhaar", "pan")
+
+FIRST_NAMES = (
+    "Aarav", "Ananya", "Rohan", "Priya", "Karthik", "Sneha", "Vikram", "Divya", "Arjun", "Meera",
+    "Rahul", "Kavya", "Siddharth", "Pooja", "Aditya", "Lakshmi", "Nikhil", "Shreya", "Varun", "Ishita",
+)
+LAST_NAMES = (
+    "Sharma", "Reddy", "Iyer", "Patel", "Nair", "Gupta", "Menon", "Rao", "Singh", "Kumar",
+    "Das", "Joshi", "Pillai", "Verma", "Bose", "Mehta", "Krishnan", "Shetty", "Chopra", "Mishra",
+)
+COLLEGES = (
+    "VELLORE INSTITUTE OF TECHNOLOGY",
+    "NATIONAL INSTITUTE OF TECHNOLOGY TRICHY",
+    "PSG COLLEGE OF TECHNOLOGY",
+    "ANNA UNIVERSITY",
+    "MANIPAL INSTITUTE OF TECHNOLOGY",
+    "BMS COLLEGE OF ENGINEERING",
+    "SRM INSTITUTE OF SCIENCE AND TECHNOLOGY",
+    "AMRITA VISHWA VIDYAPEETHAM UNIVERSITY",
+)
+BRANCH_CODES = ("BCE", "BEC", "BME", "BIT", "CSE", "ECE")
+HOSTELS = ("A", "B", "C", "D", "MH1", "LH2")
+NAME_LABELS = ("Name", "Student Name")
+ID_LABELS = ("Reg No", "Registration No", "USN", "Roll No", "Student ID", "Enrollment No")
+PHONE_LABELS = ("Phone", "Mobile", "Contact")
+DOB_SEPARATORS = ("-", "/")
+
+ROTATIONS = {90: cv2.ROTATE_90_CLOCKWISE, 180: cv2.ROTATE_180, 270: cv2.ROTATE_90_COUNTERCLOCKWISE}
+SCORED_FIELDS = ("name", "student_id", "dob", "phone", "college", "hostel", "block", "room")
+PERCENTILES = (50, 90, 95, 99)
+
+
+@dataclass
+class Variant:
+    rotation: int
+    skew: float
+    scale: float
+    blur: int
+    noise: float
+    jpeg_quality: int
+    font: int
+    photo_left: bool
+    header_band: bool
+    qr: bool
+
+
+@dataclass
+class CardSpec:
+    kind: str
+    expected: dict
+    lines: list[str]
+    header: list[str]
+    footer: str | None = None
+    qr_payload: str | None = None
+
+
+def random_variant(rng: random.Random, kind: str) -> Variant:
+    return Variant(
+        rotation=rng.choice((0, 0, 0, 90, 180, 270)),
+        skew=round(rng.uniform(-6, 6), 2) if rng.random() < 0.5 else 0.0,
+        scale=round(rng.choice((0.6, 0.8, 1.0, 1.3, 1.8)), 2),
+        blur=rng.choice((0, 0, 3, 5)),
+        noise=round(rng.choice((0.0, 4.0, 8.0, 14.0)), 1),
+        jpeg_quality=rng.choice((60, 80, 95)),
+        font=rng.randrange(len(FONTS)),
+        photo_left=rng.random() < 0.6,
+        header_band=rng.random() < 0.5,
+        qr=kind == "college" and rng.random() < 0.25,
+    )
+
+
+def random_dob(rng: random.Random, separator: str) -> str:
+    return f"{rng.randint(1, 28):02d}{separator}{rng.randint(1, 12):02d}{separator}{rng.randint(1998, 2007)}"
+
+
+def college_spec(rng: random.Random, variant: Variant) -> CardSpec:
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    student_id = f"{rng.randint(19, 24)}{rng.choice(BRANCH_CODES)}{rng.randint(1000, 9999)}"
+    expected = {
+        "name": name,
+        "student_id": student_id,
+        "dob": random_dob(rng, rng.choice(DOB_SEPARATORS)),
+        "phone": f"{rng.choice('6789')}{rng.randint(0, 999999999):09d}",
+        "college": rng.choice(COLLEGES),
+        "hostel": rng.choice(HOSTELS),
+        "block": rng.choice("ABCDEFG"),
+        "room": str(rng.randint(101, 620)),
+        "doc_type": "college_id",
+    }
+    body = [
+        f"{rng.choice(ID_LABELS)}: {student_id}",
+        f"DOB: {expected['dob']}",
+        f"{rng.choice(PHONE_LABELS)}: {expected['phone']}",
+        f"Hostel: {expected['hostel']}  Block: {expected['block']}",
+        f"Room: {expected['room']}",
+    ]
+    rng.shuffle(body)
+    spec = CardSpec(
+        kind="college",
+        expected=expected,
+        lines=[f"{rng.choice(NAME_LABELS)}: {name}", *body],
+        header=[expected["college"], "STUDENT IDENTITY CARD"],
+    )
+    if variant.qr:
+        spec.qr_payload = ";".join(
+            f"{key}={expected[key]}" for key in ("name", "student_id", "dob", "phone", "college")
+        )
+    return spec
+
+
+def aadhaar_spec(rng: random.Random, variant: Variant) -> CardSpec:
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    expected = {"name": name, "dob": random_dob(rng, "/"), "doc_type": "aadhaar"}
+    number = " ".join(f"{rng.randint(0, 9999):04d}" for _ in range(3))
+    return CardSpec(
+        kind="aadhaar",
+        expected=expected,
+        lines=[name, f"DOB: {expected['dob']}", rng.choice(("MALE", "FEMALE"))],
+        header=["GOVERNMENT OF INDIA"],
+        footer=number,
+    )
+
+
+def pan_spec(rng: random.Random, variant: Variant) -> CardSpec:
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}".upper()
+    father = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}".upper()
+    letters = "".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ") for _ in range(5))
+    number = f"{letters}{rng.randint(1000, 9999)}{rng.choice('ABCDEFGHIJKLMNOPQRSTUVWXYZ')}"
+    expected = {"name": name, "dob": random_dob(rng, "/"), "doc_type": "pan"}
+    return CardSpec(
+        kind="pan",
+        expected=expected,
+        lines=["Permanent Account Number Card", number, "Name", name, "Father's Name", father, "Date of Birth", expected["dob"]],
+        header=["INCOME TAX DEPARTMENT", "GOVT. OF INDIA"],
+    )
+
+
+CARD_SPECS = {"college": college_spec, "aadhaar": aadhaar_spec, "pan": pan_spec}
+
+
+def put_text_fit(canvas: np.ndarray, text: str, origin: tuple[int, int], max_width: int, font: int, scale: float, color, thickness: int) -> int:
+    width, height = cv2.getTextSize(text, font, scale, thickness)[0]
+    if width > max_width:
+        scale *= max_width / width
+        height = cv2.getTextSize(text, font, scale, thickness)[0][1]
+    cv2.putText(canvas, text, origin, font, scale, color, thickness, cv2.LINE_AA)
+    return height
+
+
+def render_card(spec: CardSpec, variant: Variant, rng: random.Random) -> np.ndarray:
+    width, height = CARD_SIZE
+    background = [rng.randint(225, 255) for _ in range(3)]
+    card = np.full((height, width, 3), background, dtype=np.uint8)
+    font = FONTS[variant.font]
+    ink = (rng.randint(0, 50), rng.randint(0, 50), rng.randint(0, 50))
+
+    header_height = 70 + 45 * (len(spec.header) - 1)
+    header_ink = ink
+    if variant.header_band:
+        band = (rng.randint(60, 140), rng.randint(20, 90), rng.randint(0, 60))
+        cv2.rectangle(card, (0, 0), (width, header_height), band, -1)
+        header_ink = (255, 255, 255)
+    y = 52
+    for idx, text in enumerate(spec.header):
+        scale = 1.15 if idx == 0 else 0.8
+        put_text_fit(card, text, (30, y), width - 60, font, scale, header_ink, 2)
+        y += 45
+
+    photo_w, photo_h = 190, 230
+    photo_x = 30 if variant.photo_left else width - photo_w - 30
+    photo_y = header_height + 30
+    cv2.rectangle(card, (photo_x, photo_y), (photo_x + photo_w, photo_y + photo_h), (170, 170, 170), -1)
+    cv2.ellipse(card, (photo_x + photo_w // 2, photo_y + 85), (50, 62), 0, 0, 360, (120, 120, 120), -1)
+    cv2.ellipse(card, (photo_x + photo_w // 2, photo_y + photo_h), (85, 70), 0, 180, 360, (120, 120, 120), -1)
+
+    text_x = photo_x + photo_w + 35 if variant.photo_left else 40
+    text_width = width - photo_w - 110
+    if spec.qr_payload:
+        qr = cv2.QRCodeEncoder.create().encode(spec.qr_payload)
+        qr = cv2.resize(qr, (150, 150), interpolation=cv2.INTER_NEAREST)
+        qr_x = width - 180 if variant.photo_left else 30
+        qr_y = height - 180
+        card[qr_y : qr_y + 150, qr_x : qr_x + 150] = cv2.cvtColor(qr, cv2.COLOR_GRAY2BGR)
+        text_width -= 170
+
+    y = header_height + 55
+    line_gap = max(34, min(52, (height - y - 40) // max(1, len(spec.lines))))
+    for text in spec.lines:
+        put_text_fit(card, text, (text_x, y), text_width, font, 0.85, ink, 2)
+        y += line_gap
+    if spec.footer:
+        put_text_fit(card, spec.footer, (width // 2 - 170, height - 35), 360, font, 1.2, ink, 2)
+    return card
+
+
+def photograph(card: np.ndarray, variant: Variant, rng: random.Random) -> np.ndarray:
+    # Lay the card on a darker table with a margin, so card detection has an
+    # edge to find, then apply the camera-side degradations.
+    height, width = card.shape[:2]
+    margin = int(0.12 * max(height, width))
+    table = np.full((height + 2 * margin, width + 2 * margin, 3), rng.randint(40, 110), dtype=np.uint8)
+    table[margin : margin + height, margin : margin + width] = card
+    image = table
+
+    if variant.skew:
+        center = (image.shape[1] / 2, image.shape[0] / 2)
+        matrix = cv2.getRotationMatrix2D(center, variant.skew, 1.0)
+        image = cv2.warpAffine(image, matrix, (image.shape[1], image.shape[0]), borderMode=cv2.BORDER_REPLICATE)
+    if variant.rotation:
+        image = cv2.rotate(image, ROTATIONS[variant.rotation])
+    if variant.scale != 1.0:
+        interpolation = cv2.INTER_AREA if variant.scale < 1 else cv2.INTER_CUBIC
+        image = cv2.resize(image, None, fx=variant.scale, fy=variant.scale, interpolation=interpolation)
+    if variant.blur:
+        image = cv2.GaussianBlur(image, (variant.blur, variant.blur), 0)
+    if variant.noise:
+        noise = np.random.default_rng(rng.randrange(2**32)).normal(0, variant.noise, image.shape)
+        image = np.clip(image.astype(np.float32) + noise, 0, 255).astype(np.uint8)
+    return image
+
+
+def generate(out_dir: str, count: int, seed: int) -> Path:
+    root = Path(out_dir)
+    root.mkdir(parents=True, exist_ok=True)
+    manifest = root / "manifest.jsonl"
+    # The college list the scanner snaps names to, as a deployment would
+    # configure it for its own institutions.
+    (root / "colleges.txt").write_text("\n".join(COLLEGES) + "\n", encoding="utf-8")
+    rng = random.Random(seed)
+    with manifest.open("w", encoding="utf-8") as out:
+        for idx in range(count):
+            kind = KINDS[idx % len(KINDS)]
+            variant = random_variant(rng, kind)
+            spec = CARD_SPECS[kind](rng, variant)
+            image = photograph(render_card(spec, variant, rng), variant, rng)
+            name = f"{idx:05d}-{kind}.jpg"
+            cv2.imwrite(str(root / name), image, [cv2.IMWRITE_JPEG_QUALITY, variant.jpeg_quality])
+            record = {"image": name, "kind": kind, "expected": spec.expected, "variant": asdict(variant)}
+            out.write(json.dumps(record) + "\n")
+    return manifest
+
+
+def load_scanner(path: str | None = None, rev: str | None = None):
+    # A revision is loaded from `git show`, so two revisions can be measured
+    # against the same corpus without touching the working tree.
+    source = Path(path) if path else SCANNER_PATH
+    label = path or "working-tree"
+    if rev:
+        repo = SCANNER_PATH.parent.parent
+        checkout = Path(tempfile.mkdtemp(prefix="id-card-bench-"))
+        # The scanner loads sibling scripts from its own directory, so they
+        # come from the same revision (older revisions may lack them).
+        for script in (SCANNER_PATH, *SCANNER_SIBLINGS):
+            relative = script.relative_to(repo).as_posix()
+            shown = subprocess.run(
+                ["git", "show", f"{rev}:{relative}"], cwd=repo, capture_output=True, text=True
+            )
+            if shown.returncode != 0:
+                if script == SCANNER_PATH:
+                    raise RuntimeError(shown.stderr.strip() or f"{relative} not found at {rev}")
+                continue
+            (checkout / script.name).write_text(shown.stdout, encoding="utf-8")
+        source = checkout / SCANNER_PATH.name
+        label = rev
+    module_name = "id_card_scanner_" + re.sub(r"\W", "_", label)
+    spec = importlib.util.spec_from_file_location(module_name, source)
+    module = importlib.util.module_from_spec(spec)
+    # dataclasses resolve string annotations through sys.modules.
+    sys.modules[module_name] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        del sys.modules[module_name]
+        raise
+    return module, label
+
+
+class TesseractCounter:
+    """Counts Tesseract invocations by wrapping the pytesseract entry points.
+
+    Works for every scanner revision, including ones without profiling.
+    """
+
+    ENTRY_POINTS = ("image_to_data", "image_to_string", "image_to_osd", "image_to_boxes")
+
+    def __init__(self, pytesseract):
+        self.calls = 0
+        self._lock = threading.Lock()
+        for name in self.ENTRY_POINTS:
+            original = getattr(pytesseract, name, None)
+            if original is not None:
+                setattr(pytesseract, name, self._wrap(original))
+
+    def _wrap(self, func):
+        def counted(*args, **kwargs):
+            with self._lock:
+                self.calls += 1
+            return func(*args, **kwargs)
+
+        return counted
+
+    def take(self) -> int:
+        with self._lock:
+            calls, self.calls = self.calls, 0
+        return calls
+
+
+def comparable(value) -> str:
+    return re.sub(r"[^0-9a-z]", "", str(value).lower()) if value else ""
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return round(ordered[rank], 2)
+
+
+@dataclass
+class FieldScore:
+    total: int = 0
+    correct: int = 0
+    missing: int = 0
+
+    def add(self, expected, actual) -> bool:
+        self.total += 1
+        if not actual:
+            self.missing += 1
+        ok = comparable(expected) == comparable(actual)
+        self.correct += ok
+        return ok
+
+    def to_dict(self) -> dict:
+        return {**asdict(self), "accuracy": round(self.correct / self.total, 4) if self.total else None}
+
+
+def run(
+    manifest: str,
+    scanner_path: str | None = None,
+    rev: str | None = None,
+    warmup: int = 1,
+    workers: int | None = None,
+    backend: str | None = None,
+) -> dict:
+    scanner, label = load_scanner(scanner_path, rev)
+    scanner.SCAN_CACHE_ENABLED = False
+    # Card hashing is not what is measured, and must not touch the real index.
+    scanner.CARD_HASH_ENABLED = False
+    if workers and hasattr(scanner, "configure_ocr_workers"):
+        scanner.configure_ocr_workers(workers)
+    if backend:
+        if not hasattr(scanner, "configure_ocr_backend"):
+            raise RuntimeError(f"{label} has no pluggable OCR backend")
+        scanner.configure_ocr_backend(backend)
+        label = f"{label}:{backend}"
+    counter = TesseractCounter(scanner.pytesseract)
+
+    options = {"profile": True} if "profile" in inspect.signature(scanner.scan_image).parameters else {}
+
+    root = Path(manifest).parent
+    if hasattr(scanner, "COLLEGE_LIST_PATH") and (root / "colleges.txt").exists():
+        scanner.COLLEGE_LIST_PATH = str(root / "colleges.txt")
+    records = [json.loads(line) for line in Path(manifest).read_text(encoding="utf-8").splitlines() if line.strip()]
+    for record in records[:warmup]:
+        scanner.scan_image(str(root / record["image"]))
+
+    fields = {name: FieldScore() for name in SCORED_FIELDS}
+    doc_types = FieldScore()
+    by_kind: dict[str, FieldScore] = {}
+    latencies, calls, cards = [], [], []
+    errors = 0
+    for record in records:
+        expected = record["expected"]
+        counter.take()
+        started = time.perf_counter()
+        try:
+            result = scanner.scan_image(str(root / record["image"]), **options)
+        except Exception as exc:
+            errors += 1
+            cards.append({"image": record["image"], "error": str(exc) or exc.__class__.__name__})
+            continue
+        elapsed = (time.perf_counter() - started) * 1000
+        latencies.append(elapsed)
+        # In-process backends bypass pytesseract; the scanner's own profile
+        # counts every backend, where the revision has one.
+        timings = getattr(result, "timings", None)
+        calls.append(timings["tesseract_calls"] if timings else counter.take())
+
+        actual = {
+            "name": result.name,
+            "student_id": result.hostel_id,
+            "dob": result.dob,
+            "phone": result.phone,
+            "college": result.college,
+            "hostel": result.hostel,
+            "block": result.block,
+            "room": result.room,
+        }
+        wrong = {
+            name: {"expected": expected[name], "actual": actual[name]}
+            for name in SCORED_FIELDS
+            if name in expected and not fields[name].add(expected[name], actual[name])
+        }
+        if not doc_types.add(expected["doc_type"], result.doc_type):
+            wrong["doc_type"] = {"expected": expected["doc_type"], "actual": result.doc_type}
+        exact = by_kind.setdefault(record["kind"], FieldScore())
+        exact.total += 1
+        exact.correct += not wrong
+        cards.append({"image": record["image"], "ms": round(elapsed, 2), "tesseract_calls": calls[-1], "wrong": wrong})
+
+    return {
+        "scanner": label,
+        "manifest": str(manifest),
+        "cards": len(records),
+        "errors": errors,
+        "fields": {name: score.to_dict() for name, score in fields.items() if score.total},
+        "doc_type": doc_types.to_dict(),
+        "exact_cards_by_kind": {kind: score.to_dict() for kind, score in sorted(by_kind.items())},
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+            **{f"p{pct}": percentile(latencies, pct) for pct in PERCENTILES},
+            "max": round(max(latencies), 2) if latencies else 0.0,
+        },
+        "tesseract_calls": {
+            "mean": round(sum(calls) / len(calls), 2) if calls else 0.0,
+            "p95": percentile(calls, 95),
+            "total": sum(calls),
+        },
+        "results": cards,
+    }
+
+
+def summary_rows(report: dict) -> dict[str, float]:
+    rows = {f"{name} accuracy": score["accuracy"] for name, score in report["fields"].items()}
+    rows["doc_type accuracy"] = report["doc_type"]["accuracy"]
+    rows.update({f"{kind} exact": score["accuracy"] for kind, score in report["exact_cards_by_kind"].items()})
+    rows.update({f"latency {key} ms": value for key, value in report["latency_ms"].items()})
+    rows["tesseract calls/card"] = report["tesseract_calls"]["mean"]
+    rows["errors"] = report["errors"]
+    return rows
+
+
+def print_report(report: dict, stream=sys.stdout) -> None:
+    stream.write(f"{report['scanner']}: {report['cards']} cards from {report['manifest']}\n")
+    for key, value in summary_rows(report).items():
+        stream.write(f"  {key:<28} {value}\n")
+
+
+def compare(base: dict, head: dict, tolerance: float = 0.0, stream=sys.stdout) -> bool:
+    # Accuracy may not drop by more than the tolerance; latency and call
+    # counts are reported for the reader to judge.
+    base_rows, head_rows = summary_rows(base), summary_rows(head)
+    regressed = []
+    stream.write(f"{'metric':<30} {base['scanner']:>14} {head['scanner']:>14} {'delta':>10}\n")
+    for key in dict.fromkeys([*base_rows, *head_rows]):
+        before, after = base_rows.get(key), head_rows.get(key)
+        delta = round(after - before, 4) if before is not None and after is not None else None
+        stream.write(f"{key:<30} {before!s:>14} {after!s:>14} {delta!s:>10}\n")
+        if (key.endswith("accuracy") or key.endswith("exact")) and delta is not None and delta < -tolerance:
+            regressed.append(key)
+    if head["errors"] > base["errors"]:
+        regressed.append("errors")
+    if regressed:
+        stream.write(f"Accuracy regressed: {', '.join(regressed)}\n")
+    return not regressed
+
+
+def option_value(args: list[str], name: str, default: str | None = None) -> str | None:
+    if name not in args:
+        return default
+    idx = args.index(name)
+    return args[idx + 1] if idx + 1 < len(args) else ""
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    command = args[0] if args else ""
+    if command == "generate" and len(args) > 1:
+        manifest_path = generate(args[1], int(option_value(args, "--count", "100")), int(option_value(args, "--seed", "0")))
+        print(manifest_path)
+    elif command == "run" and len(args) > 1:
+        workers = option_value(args, "--workers")
+        report = run(
+            args[1],
+            scanner_path=option_value(args, "--scanner"),
+            rev=option_value(args, "--rev"),
+            warmup=int(option_value(args, "--warmup", "1")),
+            workers=int(workers) if workers else None,
+            backend=option_value(args, "--ocr-backend"),
+        )
+        output = option_value(args, "--output")
+        if output:
+            Path(output).parent.mkdir(parents=True, exist_ok=True)
+            Path(output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print_report(report)
+    elif command == "compare" and len(args) > 2:
+        reports = [json.loads(Path(path).read_text(encoding="utf-8")) for path in args[1:3]]
+        ok = compare(*reports, tolerance=float(option_value(args, "--tolerance", "0")))
+        sys.exit(0 if ok else 1)
+    else:
+        print(__doc__)
+        sys.exit(2)
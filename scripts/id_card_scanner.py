@@ -2,6 +2,61 @@
 Hostel ID Card Scanner
 - Scans QR/Barcode from an ID card
 - Runs OCR on the card to extract key fields
+- Structured QR payloads (JSON, URL query, key=value, Aadhaar XML) can
+  satisfy the required fields on their own and skip OCR
+- Accepts a path or raw bytes (--image - reads stdin); large JPEGs are
+  decoded at reduced resolution straight from memory
+- Crops the card out of the photo and resamples it to 300 DPI before OCR
+- Fields still missing after the first pass are re-read from single-line
+  crops with field-specific settings (digit whitelists for phone/DOB,
+  uppercase alphanumerics for IDs), found via morphological line detection
+- The college is snapped to a canonical name from a college list
+  (COLLEGE_LIST_PATH, default src/lib/colleges.ts) through a trigram index
+  with edit-distance re-ranking; "college_score" is the match score
+- Caches OCR output and parsed fields in SQLite, keyed by image content
+  (SCAN_CACHE_PATH, default under SCAN_DATA_DIR, owner-only; SCAN_CACHE=0
+  or --no-cache to disable)
+- Perceptual-hashes the cropped card and reports the closest cards seen
+  before ("similar_cards" with Hamming distances) to catch a card reused
+  across accounts; --card-ref / "card_ref" leaves that ref's own cards out.
+  A card is only added to the index (CARD_HASH_INDEX_PATH, default under
+  SCAN_DATA_DIR) by a "record_card" request once its owner is verified
+  (see card_hash_index.py; CARD_HASH=0 or --no-card-hash to disable)
+- Independent Tesseract passes can fan out over a thread pool
+  (--workers N or OCR_WORKERS; 1 keeps everything sequential)
+- OCR backend is pluggable (--ocr-backend or OCR_BACKEND): pytesseract
+  (default, one tesseract process per call) or tesserocr (in-process,
+  model loaded once per worker thread; pip install tesserocr)
+- Batch mode (--batch <dir|manifest>) scans many images across worker
+  processes and streams one JSON line per image as it finishes
+- Per-stage wall/CPU time, Tesseract call counts and process peak memory
+  can be reported (--timings adds a "timings" block) and written to a
+  metrics file (--metrics-file PATH): jsonl (default) appends one record
+  per scan; prom (--metrics-format prom) keeps a Prometheus textfile
+  snapshot of cumulative counters and a scan duration histogram
+- A time budget (--deadline-ms, deadline_ms=) bounds every Tesseract call
+  and skips passes that no longer fit; the fields found so far come back
+  with "partial": true
+- Re-parse mode re-runs field extraction on stored OCR text without any
+  image libraries: --text <file|-> for one transcript, --reparse-jsonl
+  <file|-> for a stream of stored results (one JSON object per line with
+  "raw_text" and optionally "qr_data"/"header_text", or batch output lines)
+- OpenCV, pyzbar and the OCR engines are imported on first use, so the
+  parser can be imported cheaply by other tools
+- asyncio API: await scan_image_async(path_or_bytes) scans without blocking
+  the event loop, at most SCAN_MAX_CONCURRENT (--max-concurrent) at once
+  with SCAN_MAX_QUEUE (--max-queue) more waiting; beyond that it raises
+  ScannerOverloaded, and cancelling a scan kills its Tesseract processes
+- Optional daemon mode (--serve) keeps OpenCV/Tesseract warm and answers
+  newline-delimited JSON scan requests on stdin/stdout, several at a time
+  (responses come back in completion order; match them by id):
+    -> {"id": 1, "image": "/tmp/card.jpg"}
+    -> {"id": 2, "image_b64": "<base64 image bytes>", "deadline_ms": 8000, "timings": true}
+    -> {"id": 3, "image": "/tmp/card.jpg", "card_ref": "<account id>"}
+    -> {"id": 2, "cancel": true}
+    -> {"id": 4, "record_card": {"card_hash": "<hex>", "card_ref": "<account id>", "student_id": "..."}}
+    <- {"id": 1, "ok": true, "result": {...}}
+    <- {"id": 1, "ok": false, "error": "Unable to read image"}
 
 Requirements (see requirements-id-card.txt):
   pip install -r scripts/requirements-id-card.txt
@@ -10,37 +65,140 @@ Optional: Install Tesseract OCR engine and add it to PATH.
 Windows download: https://github.com/UB-Mannheim/tesseract/wiki
 """
 
+from __future__ import annotations
+
+import asyncio
+import base64
+import contextvars
+import hashlib
+import importlib.util
 import json
 import os
 import re
+import sqlite3
 import sys
+import threading
 import time
-from dataclasses import dataclass
+from abc import ABC, abstractmethod
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+from contextlib import contextmanager, nullcontext
+from dataclasses import asdict, dataclass, field, replace
+from functools import cached_property
+from itertools import chain
 from pathlib import Path
+from typing import Callable
+from urllib.parse import parse_qsl, urlsplit
+from xml.etree import ElementTree
 
-import cv2
-from pyzbar import pyzbar
-import pytesseract
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
 
 TESSERACT_PATHS = [
     r"C:\Program Files\Tesseract-OCR\tesseract.exe",
     r"C:\Program Files (x86)\Tesseract-OCR\tesseract.exe",
 ]
 
-env_tesseract = os.environ.get("TESSERACT_PATH")
-if env_tesseract:
-    pytesseract.pytesseract.tesseract_cmd = env_tesseract
-else:
+
+class LazyModule:
+    """A module imported on first attribute access.
+
+    Text-only work (re-parsing stored OCR text, importing the parser from
+    another tool) never pays for OpenCV, NumPy, pyzbar or Tesseract. A
+    missing package only fails once an image is actually scanned.
+    """
+
+    def __init__(self, name: str, on_load: Callable | None = None, path: Path | None = None):
+        self._name = name
+        self._on_load = on_load
+        self._path = path
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._module is None:
+                module = sys.modules.get(self._name)
+                if module is None and self._path is not None:
+                    # Sibling script, importable whether or not scripts/ is on sys.path.
+                    spec = importlib.util.spec_from_file_location(self._name, self._path)
+                    module = importlib.util.module_from_spec(spec)
+                    sys.modules[self._name] = module
+                    try:
+                        spec.loader.exec_module(module)
+                    except BaseException:
+                        del sys.modules[self._name]
+                        raise
+                elif module is None:
+                    module = importlib.import_module(self._name)
+                if self._on_load:
+                    self._on_load(module)
+                self._module = module
+        return self._module
+
+    def __getattr__(self, attr: str):
+        # Dunder and private probes (copy, pickle, inspect, hasattr checks)
+        # must not trigger the import. Read through __dict__: a copied or
+        # unpickled instance reaches here before __init__ has run.
+        module = self.__dict__.get("_module")
+        if module is None and attr.startswith("_"):
+            raise AttributeError(attr)
+        return getattr(module or self._load(), attr)
+
+
+def configure_tesseract_path(module) -> None:
+    env_tesseract = os.environ.get("TESSERACT_PATH")
+    if env_tesseract:
+        module.pytesseract.tesseract_cmd = env_tesseract
+        return
     for candidate in TESSERACT_PATHS:
         if Path(candidate).exists():
-            pytesseract.pytesseract.tesseract_cmd = candidate
+            module.pytesseract.tesseract_cmd = candidate
             break
 
 
+def track_tesseract_processes(module) -> None:
+    # pytesseract hands every process it starts to timeout_manager; wrapping
+    # it lets a cancelled scan kill its own in-flight Tesseract processes.
+    original = getattr(module.pytesseract, "timeout_manager", None)
+    if original is None:
+        return
+
+    @contextmanager
+    def tracked(proc, seconds=None):
+        scope = _active_cancel.get()
+        if scope is not None:
+            scope.track(proc)
+        try:
+            with original(proc, seconds) as error_string:
+                yield error_string
+        finally:
+            if scope is not None:
+                scope.untrack(proc)
+
+    module.pytesseract.timeout_manager = tracked
+
+
+def configure_pytesseract(module) -> None:
+    configure_tesseract_path(module)
+    track_tesseract_processes(module)
+
+
+cv2 = LazyModule("cv2")
+np = LazyModule("numpy")
+pyzbar = LazyModule("pyzbar.pyzbar")
+pytesseract = LazyModule("pytesseract", configure_pytesseract)
+tesserocr = LazyModule("tesserocr")
+card_hash_index = LazyModule("card_hash_index", path=Path(__file__).with_name("card_hash_index.py"))
+
+
 @dataclass
 class ScanResult:
     raw_text: str
     qr_data: str | None
+    header_text: str | None
     name: str | None
     hostel_id: str | None
     hostel: str | None
@@ -51,6 +209,543 @@ class ScanResult:
     dob: str | None
     phone: str | None
     doc_type: str | None
+    raw_lines: list[dict] | None = None
+    timings: dict | None = None
+    partial: bool = False
+    card_hash: str | None = None
+    similar_cards: list[dict] | None = None
+    college_score: float | None = None
+
+
+SCAN_METRICS_FILE = os.environ.get("SCAN_METRICS_FILE")
+SCAN_METRICS_FORMAT = os.environ.get("SCAN_METRICS_FORMAT", "jsonl")
+
+_active_profile: contextvars.ContextVar["ScanProfile | None"] = contextvars.ContextVar("scan_profile", default=None)
+_active_stage: contextvars.ContextVar["StageFrame | None"] = contextvars.ContextVar("scan_stage", default=None)
+
+
+def cpu_seconds() -> float:
+    # Children are Tesseract subprocesses; they count once they are reaped.
+    times = os.times()
+    return time.process_time() + times.children_user + times.children_system
+
+
+def peak_rss_mb(children: bool = False) -> float | None:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KiB on Linux but in bytes on macOS.
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+@dataclass
+class StageTiming:
+    wall: float = 0.0
+    cpu: float = 0.0
+    calls: int = 0
+    tesseract_calls: int = 0
+
+
+@dataclass(eq=False)
+class StageFrame:
+    name: str
+    thread: int
+    nested_wall: float = 0.0
+    nested_cpu: float = 0.0
+
+
+class ScanProfile:
+    """Per-stage wall time, CPU time and Tesseract call counts for one scan.
+
+    Stage times are exclusive: a stage entered inside another on the same
+    thread (a lazily built preprocessing stage inside an OCR pass, say) is
+    subtracted from its parent. CPU time is process-wide, so stages running
+    concurrently on OCR worker threads overlap in it.
+    """
+
+    def __init__(self, mode: str = "image"):
+        self.mode = mode
+        self.stages: dict[str, StageTiming] = {}
+        self._lock = threading.Lock()
+        self._wall = time.perf_counter()
+        self._cpu = cpu_seconds()
+
+    @contextmanager
+    def stage(self, name: str):
+        parent = _active_stage.get()
+        frame = StageFrame(name, threading.get_ident())
+        token = _active_stage.set(frame)
+        wall, cpu = time.perf_counter(), cpu_seconds()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall, cpu_seconds() - cpu
+            _active_stage.reset(token)
+            if parent is not None and parent.thread == frame.thread:
+                parent.nested_wall += wall
+                parent.nested_cpu += cpu
+            with self._lock:
+                timing = self.stages.setdefault(name, StageTiming())
+                timing.wall += wall - frame.nested_wall
+                timing.cpu += cpu - frame.nested_cpu
+                timing.calls += 1
+
+    def count_tesseract(self) -> None:
+        frame = _active_stage.get()
+        with self._lock:
+            self.stages.setdefault(frame.name if frame else "other", StageTiming()).tesseract_calls += 1
+
+    def summary(self) -> dict:
+        with self._lock:
+            stages = {
+                name: {
+                    "wall_ms": round(timing.wall * 1000, 2),
+                    "cpu_ms": round(timing.cpu * 1000, 2),
+                    "calls": timing.calls,
+                    "tesseract_calls": timing.tesseract_calls,
+                }
+                for name, timing in self.stages.items()
+            }
+        return {
+            "mode": self.mode,
+            "wall_ms": round((time.perf_counter() - self._wall) * 1000, 2),
+            "cpu_ms": round((cpu_seconds() - self._cpu) * 1000, 2),
+            "tesseract_calls": sum(stage["tesseract_calls"] for stage in stages.values()),
+            # ru_maxrss peaks over the process's life, not this scan.
+            "process_peak_rss_mb": peak_rss_mb(),
+            "tesseract_process_peak_rss_mb": peak_rss_mb(children=True),
+            "stages": stages,
+        }
+
+
+@contextmanager
+def profiling(enabled: bool = True, mode: str = "image"):
+    profile = ScanProfile(mode) if enabled else None
+    token = _active_profile.set(profile)
+    try:
+        yield profile
+    finally:
+        _active_profile.reset(token)
+
+
+def profile_stage(name: str):
+    profile = _active_profile.get()
+    return profile.stage(name) if profile is not None else nullcontext()
+
+
+def count_tesseract_call() -> None:
+    profile = _active_profile.get()
+    if profile is not None:
+        profile.count_tesseract()
+
+
+class DeadlineExceeded(RuntimeError):
+    pass
+
+
+class Deadline:
+    """A scan's time budget.
+
+    A Tesseract call only starts if the budget still covers the slowest call
+    seen so far in this scan, and is killed when the budget runs out. Either
+    way the scan is marked as hit and returns what it has.
+    """
+
+    def __init__(self, ms: float):
+        self.expires = time.monotonic() + ms / 1000
+        self.hit = False
+        self.call_seconds = 0.0
+
+    def remaining(self) -> float:
+        return self.expires - time.monotonic()
+
+    def budget(self, expected: float = 0.0) -> float:
+        remaining = self.remaining()
+        if remaining <= expected:
+            self.hit = True
+            raise DeadlineExceeded("Scan deadline exceeded")
+        return remaining
+
+
+_active_deadline: contextvars.ContextVar["Deadline | None"] = contextvars.ContextVar("scan_deadline", default=None)
+
+
+@contextmanager
+def deadline_scope(ms: "float | Deadline | None"):
+    # A number of milliseconds starts the budget now; a Deadline created
+    # earlier (when a queued scan was requested) keeps its start time.
+    deadline = ms if isinstance(ms, Deadline) or not ms else Deadline(ms)
+    token = _active_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _active_deadline.reset(token)
+
+
+def deadline_hit() -> bool:
+    deadline = _active_deadline.get()
+    return deadline is not None and deadline.hit
+
+
+class ScanCancelled(RuntimeError):
+    pass
+
+
+class CancelScope:
+    """The Tesseract processes of one scan, killed when it is cancelled.
+
+    After cancel() no further Tesseract call starts in the scan; an
+    in-process (tesserocr) call already running is left to finish.
+    """
+
+    def __init__(self):
+        self.cancelled = False
+        self._procs: set = set()
+        self._lock = threading.Lock()
+
+    def track(self, proc) -> None:
+        with self._lock:
+            if not self.cancelled:
+                self._procs.add(proc)
+                return
+        proc.kill()
+
+    def untrack(self, proc) -> None:
+        with self._lock:
+            self._procs.discard(proc)
+
+    def cancel(self) -> None:
+        with self._lock:
+            self.cancelled = True
+            procs, self._procs = self._procs, set()
+        for proc in procs:
+            try:
+                proc.kill()
+            except OSError:
+                pass
+
+
+_active_cancel: contextvars.ContextVar[CancelScope | None] = contextvars.ContextVar("scan_cancel", default=None)
+
+
+def call_tesseract(func: Callable, image, **kwargs):
+    scope = _active_cancel.get()
+    if scope is not None and scope.cancelled:
+        raise ScanCancelled("Scan cancelled")
+    count_tesseract_call()
+    deadline = _active_deadline.get()
+    if deadline is None:
+        return func(image, **kwargs)
+    started = time.monotonic()
+    try:
+        result = func(image, timeout=deadline.budget(deadline.call_seconds), **kwargs)
+    except DeadlineExceeded:
+        deadline.hit = True
+        raise
+    deadline.call_seconds = max(deadline.call_seconds, time.monotonic() - started)
+    return result
+
+
+OCR_BACKEND = os.environ.get("OCR_BACKEND", "pytesseract")
+TESSERACT_LANG = os.environ.get("TESSERACT_LANG", "eng")
+OCR_DATA_KEYS = ("level", "page_num", "block_num", "par_num", "line_num", "word_num", "left", "top", "width", "height", "conf", "text")
+TESSERACT_CONFIG_RE = re.compile(r"--(oem|psm)\s+(\d+)|-c\s+(\w+)=(\S*)")
+
+
+def parse_tesseract_config(config: str) -> tuple[int | None, dict[str, str]]:
+    # "--oem 1 --psm 7 -c name=value" -> (7, {"name": "value"}). The OEM is
+    # fixed when an engine is initialised, so it is not returned.
+    psm = None
+    variables = {}
+    for flag, number, name, value in TESSERACT_CONFIG_RE.findall(config):
+        if flag == "psm":
+            psm = int(number)
+        elif name:
+            variables[name] = value
+    return psm, variables
+
+
+class OcrBackend(ABC):
+    """Runs Tesseract on a grayscale or binary NumPy image.
+
+    image_to_data returns pytesseract's DICT layout (one entry per word box
+    in text, conf, left, top, width, height, block_num, par_num, line_num,
+    ...), so OcrLayout reads any backend. orientation returns "rotate" and
+    "orientation_conf" like image_to_osd, or None when OSD cannot decide.
+    A backend that cannot finish within timeout raises DeadlineExceeded.
+    """
+
+    name = ""
+
+    @abstractmethod
+    def image_to_data(self, image: cv2.typing.MatLike, config: str = "", timeout: float = 0.0) -> dict: ...
+
+    @abstractmethod
+    def orientation(self, image: cv2.typing.MatLike, timeout: float = 0.0) -> dict | None: ...
+
+
+class PytesseractBackend(OcrBackend):
+    name = "pytesseract"
+
+    @staticmethod
+    def _call(func: Callable, image, **kwargs):
+        try:
+            return func(image, output_type=pytesseract.Output.DICT, **kwargs)
+        except RuntimeError as exc:
+            # pytesseract kills the process and raises a bare RuntimeError on
+            # timeout; TesseractError (also a RuntimeError) passes through.
+            if type(exc) is not RuntimeError:
+                raise
+            raise DeadlineExceeded("Scan deadline exceeded") from exc
+
+    def image_to_data(self, image: cv2.typing.MatLike, config: str = "", timeout: float = 0.0) -> dict:
+        return self._call(pytesseract.image_to_data, image, config=config, timeout=timeout)
+
+    def orientation(self, image: cv2.typing.MatLike, timeout: float = 0.0) -> dict | None:
+        try:
+            return self._call(pytesseract.image_to_osd, image, timeout=timeout)
+        except pytesseract.TesseractError:
+            # Raised for sparse text ("Too few characters") or missing osd.traineddata.
+            return None
+
+
+class TesserocrBackend(OcrBackend):
+    """In-process Tesseract through tesserocr.
+
+    TessBaseAPI is not thread-safe, so every OCR worker thread keeps its own
+    engines: the language model is loaded once per thread and images are
+    handed over as raw NumPy buffers, with no temp files or processes. A
+    call cannot be interrupted; under a deadline, a call that no longer fits
+    is simply not started.
+    """
+
+    name = "tesserocr"
+
+    def __init__(self):
+        if importlib.util.find_spec("tesserocr") is None:
+            raise RuntimeError("OCR backend 'tesserocr' needs the tesserocr package")
+        self._local = threading.local()
+
+    def _engine(self):
+        local = self._local
+        if not hasattr(local, "api"):
+            local.api = tesserocr.PyTessBaseAPI(lang=TESSERACT_LANG)
+            local.defaults = {}
+        return local.api
+
+    def _osd_engine(self):
+        local = self._local
+        if not hasattr(local, "osd"):
+            local.osd = tesserocr.PyTessBaseAPI(lang="osd", psm=tesserocr.PSM.OSD_ONLY)
+        return local.osd
+
+    @staticmethod
+    def _set_image(api, image: cv2.typing.MatLike) -> None:
+        image = np.ascontiguousarray(image)
+        height, width = image.shape[:2]
+        channels = 1 if image.ndim == 2 else image.shape[2]
+        api.SetImageBytes(image.tobytes(), width, height, channels, image.strides[0])
+
+    def _configure(self, api, config: str) -> None:
+        psm, variables = parse_tesseract_config(config)
+        api.SetPageSegMode(psm if psm is not None else tesserocr.PSM.AUTO)
+        # Variables stick to the engine, so any set by an earlier call and
+        # not by this one go back to their defaults.
+        defaults = self._local.defaults
+        for name in variables.keys() - defaults.keys():
+            defaults[name] = api.GetVariableAsString(name) or ""
+        for name, default in defaults.items():
+            api.SetVariable(name, variables.get(name, default))
+
+    def image_to_data(self, image: cv2.typing.MatLike, config: str = "", timeout: float = 0.0) -> dict:
+        api = self._engine()
+        self._configure(api, config)
+        self._set_image(api, image)
+        api.Recognize()
+
+        data: dict[str, list] = {key: [] for key in OCR_DATA_KEYS}
+        iterator = api.GetIterator()
+        if iterator is None:
+            return data
+        level = tesserocr.RIL.WORD
+        block = par = line = word = 0
+        for item in tesserocr.iterate_level(iterator, level):
+            if item.IsAtBeginningOf(tesserocr.RIL.BLOCK):
+                block, par, line = block + 1, 0, 0
+            if item.IsAtBeginningOf(tesserocr.RIL.PARA):
+                par, line = par + 1, 0
+            if item.IsAtBeginningOf(tesserocr.RIL.TEXTLINE):
+                line, word = line + 1, 0
+            word += 1
+            box = item.BoundingBox(level)
+            if box is None:
+                continue
+            left, top, right, bottom = box
+            values = (5, 1, block, par, line, word, left, top, right - left, bottom - top)
+            for key, value in zip(OCR_DATA_KEYS, values):
+                data[key].append(value)
+            data["conf"].append(item.Confidence(level))
+            data["text"].append(item.GetUTF8Text(level) or "")
+        return data
+
+    def orientation(self, image: cv2.typing.MatLike, timeout: float = 0.0) -> dict | None:
+        try:
+            # Creating the engine fails when osd.traineddata is missing.
+            api = self._osd_engine()
+            self._set_image(api, image)
+            osd = api.DetectOrientationScript()
+        except RuntimeError:
+            return None
+        if not osd:
+            return None
+        # orient_deg is the text's rotation; "rotate" is the correction.
+        return {"rotate": (360 - int(osd["orient_deg"])) % 360, "orientation_conf": float(osd["orient_conf"])}
+
+
+OCR_BACKENDS: dict[str, type[OcrBackend]] = {
+    backend.name: backend for backend in (PytesseractBackend, TesserocrBackend)
+}
+_ocr_backend: OcrBackend | None = None
+_ocr_backend_lock = threading.Lock()
+
+
+def configure_ocr_backend(name: str) -> None:
+    global OCR_BACKEND, _ocr_backend
+    if name not in OCR_BACKENDS:
+        raise RuntimeError(f"Unknown OCR backend: {name}")
+    OCR_BACKEND = name
+    _ocr_backend = None
+
+
+def get_ocr_backend() -> OcrBackend:
+    global _ocr_backend
+    with _ocr_backend_lock:
+        if _ocr_backend is None:
+            if OCR_BACKEND not in OCR_BACKENDS:
+                raise RuntimeError(f"Unknown OCR backend: {OCR_BACKEND}")
+            _ocr_backend = OCR_BACKENDS[OCR_BACKEND]()
+        return _ocr_backend
+
+
+# Upper bounds (seconds) of the scan duration histogram buckets.
+SCAN_DURATION_BUCKETS = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 32.0)
+
+
+def max_known(a: float | None, b: float | None) -> float | None:
+    return b if a is None else a if b is None else max(a, b)
+
+
+class PromMetrics:
+    """Cumulative scan metrics in the Prometheus text exposition format.
+
+    Counters and the duration histogram accumulate over the process's life;
+    the peak RSS gauges are the process-lifetime peaks from ru_maxrss, not
+    per-scan figures.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.scans: dict[str, StageTiming] = {}
+        self.buckets: dict[str, list[int]] = {}
+        self.stages: dict[tuple[str, str], StageTiming] = {}
+        self.peak_rss_mb: float | None = None
+        self.tesseract_peak_rss_mb: float | None = None
+
+    def record(self, timings: dict) -> str:
+        mode = timings["mode"]
+        wall = timings["wall_ms"] / 1000
+        with self._lock:
+            scans = self.scans.setdefault(mode, StageTiming())
+            scans.wall += wall
+            scans.cpu += timings["cpu_ms"] / 1000
+            scans.calls += 1
+            scans.tesseract_calls += timings["tesseract_calls"]
+            buckets = self.buckets.setdefault(mode, [0] * len(SCAN_DURATION_BUCKETS))
+            for index, bound in enumerate(SCAN_DURATION_BUCKETS):
+                if wall <= bound:
+                    buckets[index] += 1
+            for name, stage in timings["stages"].items():
+                totals = self.stages.setdefault((mode, name), StageTiming())
+                totals.wall += stage["wall_ms"] / 1000
+                totals.cpu += stage["cpu_ms"] / 1000
+                totals.calls += stage["calls"]
+                totals.tesseract_calls += stage["tesseract_calls"]
+            # Batch timings come from several worker processes; keep the largest.
+            self.peak_rss_mb = max_known(self.peak_rss_mb, timings["process_peak_rss_mb"])
+            self.tesseract_peak_rss_mb = max_known(
+                self.tesseract_peak_rss_mb, timings["tesseract_process_peak_rss_mb"]
+            )
+            return self.render()
+
+    def render(self) -> str:
+        lines: list[str] = []
+
+        def family(name: str, kind: str, help_text: str, samples: list[tuple[str, float]]) -> None:
+            # Each sample is (suffix and labels, value), e.g. ('_count{mode="image"}', 3).
+            if not samples:
+                return
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for series, value in samples:
+                lines.append(f"{name}{series} {value if isinstance(value, int) else round(value, 6)}")
+
+        by_mode = sorted(self.scans.items())
+        duration = []
+        for mode, scans in by_mode:
+            for bound, count in zip(SCAN_DURATION_BUCKETS, self.buckets[mode]):
+                duration.append((f'_bucket{{mode="{mode}",le="{bound}"}}', count))
+            duration.append((f'_bucket{{mode="{mode}",le="+Inf"}}', scans.calls))
+            duration.append((f'_sum{{mode="{mode}"}}', scans.wall))
+            duration.append((f'_count{{mode="{mode}"}}', scans.calls))
+        family("id_scan_duration_seconds", "histogram", "Wall time of each scan.", duration)
+        family("id_scan_cpu_seconds_total", "counter", "CPU time of scans, including Tesseract subprocesses.",
+               [(f'{{mode="{mode}"}}', scans.cpu) for mode, scans in by_mode])
+        family("id_scan_tesseract_calls_total", "counter", "Tesseract calls made by scans.",
+               [(f'{{mode="{mode}"}}', scans.tesseract_calls) for mode, scans in by_mode])
+
+        by_stage = [
+            (f'{{mode="{mode}",stage="{name}"}}', totals) for (mode, name), totals in sorted(self.stages.items())
+        ]
+        family("id_scan_stage_seconds_total", "counter", "Wall time spent in each scan stage.",
+               [(labels, totals.wall) for labels, totals in by_stage])
+        family("id_scan_stage_cpu_seconds_total", "counter", "CPU time spent in each scan stage.",
+               [(labels, totals.cpu) for labels, totals in by_stage])
+        family("id_scan_stage_calls_total", "counter", "Times each scan stage ran.",
+               [(labels, totals.calls) for labels, totals in by_stage])
+        family("id_scan_stage_tesseract_calls_total", "counter", "Tesseract calls made in each scan stage.",
+               [(labels, totals.tesseract_calls) for labels, totals in by_stage])
+
+        for name, value, help_text in (
+            ("id_scan_process_peak_rss_bytes", self.peak_rss_mb, "Lifetime peak RSS of the scanner process."),
+            ("id_scan_tesseract_process_peak_rss_bytes", self.tesseract_peak_rss_mb,
+             "Peak RSS of the largest Tesseract subprocess reaped so far."),
+        ):
+            if value is not None:
+                family(name, "gauge", help_text, [("", int(value * 1024 * 1024))])
+        return "\n".join(lines) + "\n"
+
+
+_prom_metrics = PromMetrics()
+
+
+def record_metrics(timings: dict, path: str | None = None, fmt: str | None = None) -> None:
+    # jsonl appends one record per scan. prom keeps a single snapshot that
+    # is replaced atomically after each scan, as node_exporter's textfile
+    # collector expects; a reader never sees a half-written file.
+    path = path or SCAN_METRICS_FILE
+    fmt = fmt or SCAN_METRICS_FORMAT
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    if fmt == "jsonl":
+        with open(target, "a", encoding="utf-8") as out:
+            out.write(json.dumps({"timestamp": round(time.time(), 3), **timings}) + "\n")
+    elif fmt == "prom":
+        text = _prom_metrics.record(timings)
+        temp = target.with_name(f".{target.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        temp.write_text(text, encoding="utf-8")
+        os.replace(temp, target)
+    else:
+        raise RuntimeError(f"Unknown metrics format: {fmt}")
 
 
 def normalize_text(text: str) -> str:
@@ -63,276 +758,693 @@ def normalize_text(text: str) -> str:
     return "\n".join(cleaned)
 
 
+AADHAAR_KEYWORDS = ("aadhaar", "uidai", "government of india", "unique identification", "vid")
+PAN_KEYWORDS = ("income tax", "permanent account number", "pan", "govt of india")
+COLLEGE_KEYWORDS = (
+    "college",
+    "university",
+    "institute",
+    "student",
+    "campus",
+    "department",
+    "branch",
+    "semester",
+    "reg no",
+    "registration",
+    "usn",
+    "student id",
+)
+
+
 def classify_document(text: str) -> str:
     text_lower = text.lower()
-    aadhaar_keywords = ["aadhaar", "uidai", "government of india", "unique identification", "vid"]
-    pan_keywords = ["income tax", "permanent account number", "pan", "govt of india"]
-    college_keywords = ["college", "university", "institute", "student", "campus", "department", "branch", "semester", "reg no", "registration", "usn", "student id"]
-
-    if any(word in text_lower for word in aadhaar_keywords):
+    if any(word in text_lower for word in AADHAAR_KEYWORDS):
         return "aadhaar"
-    if any(word in text_lower for word in pan_keywords):
+    if any(word in text_lower for word in PAN_KEYWORDS):
         return "pan"
-    if any(word in text_lower for word in college_keywords):
+    if any(word in text_lower for word in COLLEGE_KEYWORDS):
         return "college_id"
     return "other"
 
 
-def parse_fields(text: str) -> dict:
-    text_clean = normalize_text(text)
-    lines = text_clean.split("\n")
-    name = None
-    hostel_id = None
-    hostel = None
-    college = None
-    block = None
-    floor = None
-    room = None
-    dob = None
-    phone = None
-
-    def clean_trailing_labels(value: str) -> str:
-        cleaned = re.sub(
-            r"\b(Reg\s*No\.?|Reg\s*No|Registration\s*No|Regn\.?\s*No|Enrollment\s*No|USN|Roll\s*No|Student\s*ID|Branch|DOB|D\.O\.B\.|Date of Birth)\b.*$",
-            "",
-            value,
-            flags=re.IGNORECASE,
-        )
-        return cleaned.strip(" -:")
+# Field extraction patterns are compiled once at import; parse_fields runs many
+# times per card in the cascade, camera voting, batch and daemon paths.
+_ID_LABELS = r"Reg\s*No\.?|Reg\s*No|Registration\s*No|Regn\.?\s*No|Enrollment\s*No|USN|Roll\s*No|Student\s*ID"
+_NAME_STOP = r"(?=\s*(?:Reg\s*No|Regn|Registration|Student\s*ID|USN|Roll\s*No|Branch|DOB|D\.O\.B\.|Date of Birth|$))"
+_DOB_LABELS = r"DOB|D\.O\.B\.|Date of Birth"
+
+TRAILING_LABELS_RE = re.compile(rf"\b({_ID_LABELS}|Branch|{_DOB_LABELS})\b.*$", re.IGNORECASE)
+COLLEGE_HEADER_RE = re.compile(r"^college_header:(.*)$", re.IGNORECASE | re.MULTILINE)
+COLLEGE_LINE_RE = re.compile(r"\b(College|University|Institute)\b", re.IGNORECASE)
+# A labelled value ("College: ..."), not the tail of a name that merely
+# contains the word, and never the line below.
+COLLEGE_INLINE_RE = re.compile(
+    r"(?:College|University|Institute|Campus)(?:[ \t]+name)?[ \t]*:[ \t]*([A-Za-z0-9 .,'-]{4,})", re.IGNORECASE
+)
+# Lines naming the body a college is affiliated to rather than the college.
+AFFILIATION_RE = re.compile(
+    r"\b(?:affiliated|affiliation|recogni[sz]ed|approved|accredited|constituent)\b", re.IGNORECASE
+)
+UNIVERSITY_RE = re.compile(r"\buniversity\b", re.IGNORECASE)
+COLLEGE_NAME_RE = re.compile(r"\b(?:college|institute|school|academy)\b", re.IGNORECASE)
+COLLEGE_STRIP_RE = re.compile(r"[^A-Za-z&.,'\s-]")
+MULTI_SPACE_RE = re.compile(r"\s{2,}")
+UPPERCASE_LINE_RE = re.compile(r"[A-Z][A-Z .,'&-]{6,}")
+DIGIT_RE = re.compile(r"\d")
+PHONE_DIGITS_RE = re.compile(r"\b\d{10}\b")
+HOSTEL_RE = re.compile(r"(?:Hostel|Residence|Hall)[:\s]*([A-Z0-9-]{1,})", re.IGNORECASE)
+BLOCK_RE = re.compile(r"(?:Block)[:\s]*([A-Z0-9-]{1,})", re.IGNORECASE)
+FLOOR_RE = re.compile(r"(?:Floor)[:\s]*([A-Z0-9-]{1,})", re.IGNORECASE)
+ROOM_RE = re.compile(r"(?:Room)[:\s]*([A-Z0-9-]{1,})", re.IGNORECASE)
+ID_SHAPE_RE = re.compile(r"\b[A-Z]{0,3}\d{2}[A-Z]{1,4}\d{2,4}\b")
+GENERIC_ID_RE = re.compile(r"\b[A-Z0-9-]{6,}\b")
+
+ID_SKIP_TERMS = frozenset({"CARD", "STUDENT", "ID", "BRANCH"})
+GENERIC_ID_BLACKLIST = frozenset({"STUDENT", "COLLEGE", "ENGINEERING", "CARD", "UNIVERSITY", "INSTITUTE"})
+COLLEGE_NAME_KEYWORDS = ("college", "university", "institute", "institutions", "engineering", "school", "campus")
+HEADER_INSTITUTION_TERMS = ("college", "university", "institute", "school", "campus")
+ADDRESS_TERMS = frozenset(
+    {
+        "layout",
+        "road",
+        "rd",
+        "street",
+        "st",
+        "nagar",
+        "colony",
+        "district",
+        "state",
+        "pin",
+        "pincode",
+        "bangalore",
+        "bengaluru",
+        "karnataka",
+        "india",
+        "po",
+    }
+)
+HEADER_STOP_TERMS = frozenset(
+    {
+        "name",
+        "reg",
+        "registration",
+        "student",
+        "id",
+        "branch",
+        "dob",
+        "d.o.b",
+        "date of birth",
+        "acd",
+        "academic",
+        "year",
+        "hostel",
+        "room",
+        "block",
+        "floor",
+    }
+)
 
-    def infer_college_from_header() -> str | None:
-        header_lines = lines[:6]
-        if not header_lines:
-            return None
 
-        address_terms = {
-            "layout",
-            "road",
-            "rd",
-            "street",
-            "st",
-            "nagar",
-            "colony",
-            "district",
-            "state",
-            "pin",
-            "pincode",
-            "bangalore",
-            "bengaluru",
-            "karnataka",
-            "india",
-            "po",
-        }
-        stop_terms = {
-            "name",
-            "reg",
-            "registration",
-            "student",
-            "id",
-            "branch",
-            "dob",
-            "d.o.b",
-            "date of birth",
-            "acd",
-            "academic",
-            "year",
-            "hostel",
-            "room",
-            "block",
-            "floor",
-        }
+def has_digit(value: str) -> bool:
+    return bool(DIGIT_RE.search(value))
 
-        def score_line(line: str) -> int:
-            lowered = line.lower()
-            score = 0
-            if any(term in lowered for term in ("college", "university", "institute", "school", "campus")):
-                score += 6
-            if any(term in lowered for term in address_terms):
-                score -= 5
-            if any(term in lowered for term in stop_terms):
-                score -= 4
-            digits = sum(ch.isdigit() for ch in line)
-            if digits >= 4:
-                score -= 3
-            letters = sum(ch.isalpha() for ch in line)
-            if letters >= 8 and digits == 0:
-                score += 2
-            if re.fullmatch(r"[A-Z][A-Z .,'&-]{6,}", line):
-                score += 2
-            if len(line) < 6:
-                score -= 2
-            return score
-
-        best_line = None
-        best_score = -999
-        for line in header_lines:
-            score = score_line(line)
-            if score > best_score:
-                best_score = score
-                best_line = line
-
-        if best_line and best_score >= 2:
-            return best_line.strip(" -:")
-        return None
 
-    def find_after_label(
-        label_pattern: str,
-        value_pattern: str,
-        skip_terms: set[str] | None = None,
-        validator=None,
-    ) -> str | None:
-        pattern = re.compile(label_pattern, re.IGNORECASE)
-        value_re = re.compile(value_pattern, re.IGNORECASE)
-        skip_terms = skip_terms or set()
-
-        for idx, line in enumerate(lines):
-            if pattern.search(line):
-                inline = value_re.search(line)
-                if inline:
-                    value = inline.group(1).strip()
-                    if value.upper() in skip_terms:
-                        continue
-                    if validator and not validator(value):
-                        continue
-                    return value
-                if idx + 1 < len(lines):
-                    next_line = lines[idx + 1].strip()
-                    inline_next = value_re.search(next_line)
-                    if inline_next:
-                        value = inline_next.group(1).strip()
-                        if value.upper() in skip_terms:
-                            continue
-                        if validator and not validator(value):
-                            continue
-                        return value
+@dataclass(frozen=True, eq=False)
+class LabelRule:
+    """A labelled field: the value follows the label inline or on the next line.
+
+    Rules for the same field are listed in priority order; a lower-priority
+    rule's match is only used when no earlier rule for that field matched.
+    """
+
+    field: str
+    label: re.Pattern
+    value: re.Pattern
+    skip_terms: frozenset = frozenset()
+    validator: Callable[[str], bool] | None = None
+    normalize: Callable[[str], str] | None = None
+
+    def _accept(self, match: re.Match) -> str | None:
+        value = match.group(1).strip()
+        if value.upper() in self.skip_terms:
+            return None
+        if self.validator and not self.validator(value):
+            return None
+        return self.normalize(value) if self.normalize else value
+
+    def extract(self, line: str, next_line: str | None) -> str | None:
+        inline = self.value.search(line)
+        if inline:
+            # A rejected inline value does not fall through to the next line.
+            return self._accept(inline)
+        if next_line is not None:
+            inline_next = self.value.search(next_line)
+            if inline_next:
+                return self._accept(inline_next)
         return None
 
-    name = find_after_label(
-        r"\b(Name|Student Name)\b",
-        r"(?:Name|Student Name)[:\s-]*([A-Z][A-Za-z .'-]{2,}?)(?=\s*(?:Reg\s*No|Regn|Registration|Student\s*ID|USN|Roll\s*No|Branch|DOB|D\.O\.B\.|Date of Birth|$))",
-    )
-    if not name:
-        name = find_after_label(r"\bName\b", r"^([A-Z][A-Za-z .'-]{2,}?)(?=\s*(?:Reg\s*No|Regn|Registration|Student\s*ID|USN|Roll\s*No|Branch|DOB|D\.O\.B\.|Date of Birth|$))")
-    if name:
-        name = clean_trailing_labels(name)
-        if len(name) < 3:
-            name = None
 
-    hostel_id = find_after_label(
-        r"\b(Reg\s*No\.?|Reg\s*No|Registration\s*No|Regn\.?\s*No|Enrollment\s*No|USN|Roll\s*No|Student\s*ID)\b",
-        r"(?:Reg\s*No\.?|Reg\s*No|Registration\s*No|Regn\.?\s*No|Enrollment\s*No|USN|Roll\s*No|Student\s*ID)[:\s-]*([A-Z0-9-]{4,})",
-        skip_terms={"CARD", "STUDENT", "ID", "BRANCH"},
-        validator=lambda value: bool(re.search(r"\d", value)),
-    )
-    if not hostel_id:
-        hostel_id = find_after_label(
-            r"\b(Reg\s*No\.?|Registration|Regn\.?|Enrollment|USN|Roll\s*No)\b",
-            r"^([A-Z0-9-]{4,})$",
-            skip_terms={"CARD", "STUDENT", "ID", "BRANCH"},
-            validator=lambda value: bool(re.search(r"\d", value)),
-        )
-    if hostel_id and not re.search(r"\d", hostel_id):
-        hostel_id = None
+LABEL_RULES = (
+    LabelRule(
+        "name",
+        re.compile(r"\b(Name|Student Name)\b", re.IGNORECASE),
+        re.compile(rf"(?:Name|Student Name)[:\s-]*([A-Z][A-Za-z .'-]{{2,}}?){_NAME_STOP}", re.IGNORECASE),
+    ),
+    LabelRule(
+        "name",
+        re.compile(r"\bName\b", re.IGNORECASE),
+        re.compile(rf"^([A-Z][A-Za-z .'-]{{2,}}?){_NAME_STOP}", re.IGNORECASE),
+    ),
+    LabelRule(
+        "student_id",
+        re.compile(rf"\b({_ID_LABELS})\b", re.IGNORECASE),
+        re.compile(rf"(?:{_ID_LABELS})[:\s-]*([A-Z0-9-]{{4,}})", re.IGNORECASE),
+        skip_terms=ID_SKIP_TERMS,
+        validator=has_digit,
+    ),
+    LabelRule(
+        "student_id",
+        re.compile(r"\b(Reg\s*No\.?|Registration|Regn\.?|Enrollment|USN|Roll\s*No)\b", re.IGNORECASE),
+        re.compile(r"^([A-Z0-9-]{4,})$", re.IGNORECASE),
+        skip_terms=ID_SKIP_TERMS,
+        validator=has_digit,
+    ),
+    LabelRule(
+        "dob",
+        re.compile(rf"\b({_DOB_LABELS})\b", re.IGNORECASE),
+        re.compile(rf"(?:{_DOB_LABELS})[^0-9A-Za-z]{{0,6}}([0-3]?\d[\-/\s][01]?\d[\-/\s](?:19|20)?\d\d)", re.IGNORECASE),
+    ),
+    LabelRule(
+        "dob",
+        re.compile(rf"\b({_DOB_LABELS})\b", re.IGNORECASE),
+        re.compile(
+            rf"(?:{_DOB_LABELS})[^0-9A-Za-z]{{0,6}}([0-3]?\d[\s\-/]*[A-Za-z]{{3,9}}[\s\-/]*(?:19|20)?\d\d)",
+            re.IGNORECASE,
+        ),
+        normalize=lambda value: re.sub(r"\s+", "-", value),
+    ),
+    LabelRule(
+        "phone",
+        re.compile(r"\b(Phone|Mobile|Contact|Emergency\s*Phone)\b", re.IGNORECASE),
+        re.compile(r"(?:Phone|Mobile|Contact|Emergency\s*Phone)[:\s-]*([+]?\d[\d\s-]{7,})", re.IGNORECASE),
+    ),
+)
+# One alternation of every label: lines without any label skip all rules.
+ANY_LABEL_RE = re.compile("|".join(dict.fromkeys(rule.label.pattern for rule in LABEL_RULES)), re.IGNORECASE)
 
-    college_header = None
+
+def clean_trailing_labels(value: str) -> str:
+    return TRAILING_LABELS_RE.sub("", value).strip(" -:")
+
+
+def sanitize_college(value: str | None) -> str | None:
+    if not value:
+        return None
+    cleaned = COLLEGE_STRIP_RE.sub(" ", value)
+    cleaned = MULTI_SPACE_RE.sub(" ", cleaned).strip(" -:")
+    if len(cleaned) < 6:
+        return None
+    lowered = cleaned.lower()
+    word_count = len(cleaned.split())
+    if not any(keyword in lowered for keyword in COLLEGE_NAME_KEYWORDS):
+        if word_count < 2 or len(cleaned) < 12:
+            return None
+    return cleaned
+
+
+def score_college_line(line: str) -> int:
+    lowered = line.lower()
+    score = 0
+    if any(term in lowered for term in HEADER_INSTITUTION_TERMS):
+        score += 6
+    if any(term in lowered for term in ADDRESS_TERMS):
+        score -= 5
+    if any(term in lowered for term in HEADER_STOP_TERMS):
+        score -= 4
+    digits = sum(ch.isdigit() for ch in line)
+    if digits >= 4:
+        score -= 3
+    letters = sum(ch.isalpha() for ch in line)
+    if letters >= 8 and digits == 0:
+        score += 2
+    if UPPERCASE_LINE_RE.fullmatch(line):
+        score += 2
+    if len(line) < 6:
+        score -= 2
+    return score
+
+
+def affiliation_lines(lines: list[str]) -> list[bool]:
+    """Flag header lines that name an affiliating body, not the college.
+
+    >>> affiliation_lines(["PSG COLLEGE OF TECHNOLOGY", "(Affiliated to Anna University)"])
+    [False, True]
+    >>> affiliation_lines(["SRI VENKATESWARA COLLEGE", "UNIVERSITY OF DELHI", "Name: Ravi"])
+    [False, True, False]
+    >>> affiliation_lines(["UNIVERSITY OF DELHI", "STUDENT IDENTITY CARD"])
+    [False, False]
+    """
+    flags = []
+    previous = ""
     for line in lines:
-        if line.lower().startswith("college_header:"):
-            college_header = line.split(":", 1)[1].strip()
+        # A university printed right under a college's own name is the one
+        # it is affiliated to.
+        under_college = bool(
+            UNIVERSITY_RE.search(line) and not COLLEGE_NAME_RE.search(line) and COLLEGE_NAME_RE.search(previous)
+        )
+        flags.append(under_college or bool(AFFILIATION_RE.search(line)))
+        previous = line
+    return flags
+
+
+def line_at(text: str, start: int, end: int) -> str:
+    begin = text.rfind("\n", 0, start) + 1
+    stop = text.find("\n", end)
+    return text[begin : stop if stop != -1 else None]
+
+
+def infer_college_from_header(lines: list[str]) -> str | None:
+    best_line = None
+    best_score = -999
+    for line in lines[:6]:
+        score = score_college_line(line)
+        if score > best_score:
+            best_score = score
+            best_line = line
+
+    if best_line and best_score >= 2:
+        return best_line.strip(" -:")
+    return None
+
+
+COLLEGE_LIST_PATH = os.environ.get(
+    "COLLEGE_LIST_PATH", str(Path(__file__).resolve().parent.parent / "src" / "lib" / "colleges.ts")
+)
+COLLEGE_MATCH_MIN_SCORE = 0.9
+# Campuses of one institution differ only in the last word or two: a text is
+# only snapped when the winner beats every other college by this much score,
+# whether or not the runner-up clears the minimum itself.
+COLLEGE_MATCH_MARGIN = 0.05
+COLLEGE_RECHECK_MIN_SCORE = 0.7
+COLLEGE_MIN_CONTAINMENT = 0.4
+COLLEGE_CANDIDATES = 5
+COLLEGE_SCAN_LINES = 8
+# Trigrams carried by more than this share of the list (" co", "lle", ...)
+# are left out of the postings once the list is large; they would make every
+# lookup walk most of the list.
+COLLEGE_COMMON_GRAM_SHARE = 0.05
+COLLEGE_COMMON_GRAM_MIN = 50
+# Cards print the long form of names the list abbreviates.
+COLLEGE_ABBREVIATIONS = {
+    "iit": "indian institute of technology",
+    "nit": "national institute of technology",
+    "iiit": "international institute of information technology",
+    "bits": "birla institute of technology and science",
+    "vit": "vellore institute of technology",
+    "iisc": "indian institute of science",
+    "srm": "srm institute of science and technology",
+}
+# "PILANI - HYDERABAD CAMPUS" or a place after the last comma or dash
+# ("... KARNATAKA, SURATHKAL") names the campus, which decides between
+# campuses of one institution.
+COLLEGE_CAMPUS_RE = re.compile(r"\b([A-Za-z]+)\s+campus\b", re.IGNORECASE)
+COLLEGE_PLACE_RE = re.compile(r"[,\u2013-]\s*([A-Za-z]+)[\s.)]*$")
+# Words that say what kind of institution it is, not which one.
+COLLEGE_GENERIC_WORDS = frozenset(
+    ("university", "college", "institute", "school", "of", "the", "and", "technology", "science", "engineering")
+)
+TS_STRING_RE = re.compile(r"[\"'`]((?:[^\"'`\\]|\\.)*)[\"'`]")
+COLLEGE_KEY_RE = re.compile(r"[^a-z0-9]+")
+
+
+def college_key(text: str) -> str:
+    return COLLEGE_KEY_RE.sub(" ", text.lower().replace("&", " and ")).strip()
+
+
+def college_grams(key: str) -> set[str]:
+    padded = f" {key} "
+    return {padded[idx : idx + 3] for idx in range(len(padded) - 2)}
+
+
+def college_campus(text: str) -> str | None:
+    match = COLLEGE_CAMPUS_RE.search(text) or COLLEGE_PLACE_RE.search(text)
+    return match.group(1).lower() if match else None
+
+
+def expand_college_key(words: list[str]) -> str:
+    # "vit vellore" -> "vellore institute of technology": words the long form
+    # already contains are not repeated.
+    expanded: list[str] = []
+    for word in words:
+        if word in COLLEGE_ABBREVIATIONS:
+            expanded.extend(COLLEGE_ABBREVIATIONS[word].split())
+        elif word not in expanded:
+            expanded.append(word)
+    return " ".join(expanded)
+
+
+def word_distance(pattern: str, text: str) -> int:
+    """Fewest edits turning pattern into a run of whole words of text.
+
+    Myers' bit-parallel edit distance, started at each word start of text
+    and read at each word end: extra words around the college name in a
+    header line cost nothing, but a word only partly covered by the name
+    ("iit" inside "iiit") costs its missing characters.
+    """
+    size = len(pattern)
+    if not size:
+        return 0
+    peq: dict[str, int] = {}
+    for idx, char in enumerate(pattern):
+        peq[char] = peq.get(char, 0) | (1 << idx)
+    mask = (1 << size) - 1
+    high = 1 << (size - 1)
+    length = len(text)
+    best = size
+    for start in range(length):
+        # A window shorter than size - best, or longer than size + best,
+        # cannot beat best.
+        if length - start <= size - best:
+            break
+        if start and text[start - 1] != " " or text[start] == " ":
+            continue
+        pv, mv, score = mask, 0, size
+        for pos in range(start, min(length, start + size + best)):
+            eq = peq.get(text[pos], 0)
+            xv = eq | mv
+            xh = (((eq & pv) + pv) ^ pv) | eq
+            ph = mv | ~(xh | pv)
+            mh = pv & xh
+            if ph & high:
+                score += 1
+            elif mh & high:
+                score -= 1
+            ph = (ph << 1) | 1
+            mh <<= 1
+            pv = (mh | ~(xv | ph)) & mask
+            mv = ph & xv & mask
+            if score < best and (pos + 1 == length or text[pos + 1] == " "):
+                best = score
+        if not best:
             break
+    return best
+
+
+def load_college_names(path: str) -> list[str]:
+    # A TypeScript/JavaScript module (string literals of its first array, e.g.
+    # src/lib/colleges.ts), a JSON array, or one name per line. In JSON
+    # objects and text lines, extra spellings follow the name ("aliases" or
+    # "Name | Alias | Alias").
+    source = Path(path)
+    if not source.exists():
+        return []
+    text = source.read_text(encoding="utf-8")
+    if source.suffix in (".ts", ".tsx", ".js", ".mjs"):
+        start = text.find("[", text.find("="))
+        end = text.find("]", start)
+        if start < 0 or end < 0:
+            return []
+        return [match.group(1) for match in TS_STRING_RE.finditer(text[start:end])]
+    if source.suffix == ".json":
+        return [
+            " | ".join([item["name"], *item.get("aliases", [])]) if isinstance(item, dict) else item
+            for item in json.loads(text)
+        ]
+    return [line.strip() for line in text.splitlines() if line.strip() and not line.startswith("#")]
 
-    def sanitize_college(value: str | None) -> str | None:
-        if not value:
-            return None
-        cleaned = re.sub(r"[^A-Za-z&.,'\s-]", " ", value)
-        cleaned = re.sub(r"\s{2,}", " ", cleaned).strip(" -:")
-        if len(cleaned) < 6:
-            return None
-        lowered = cleaned.lower()
-        keywords = [
-            "college",
-            "university",
-            "institute",
-            "institutions",
-            "engineering",
-            "school",
-            "campus",
+
+@dataclass
+class CollegeMatch:
+    name: str
+    score: float
+    matched: int = 0
+    campus: bool = False
+
+
+class CollegeGazetteer:
+    """Snap noisy OCR'd college names to a canonical list.
+
+    Every spelling of every college (the name, listed aliases and the long
+    form of known abbreviations) is indexed by character trigram. A lookup
+    counts shared trigrams through the postings, keeps the spellings whose
+    trigrams mostly occur in the text, and ranks those few by edit distance
+    to their best-matching run of whole words in the text. A campus the
+    text names counts as matched in the spellings that carry it, and rules
+    out the institution's other campuses.
+
+    >>> gazetteer = CollegeGazetteer(
+    ...     ["NIT Surathkal", "NIT Warangal", "IIT Hyderabad", "IIIT Hyderabad", "BITS Pilani", "BITS Hyderabad",
+    ...      "Anna University", "University of Delhi"]
+    ... )
+    >>> gazetteer.match(["NATIONAL INSTITUTE OF TECHNOLOGY KARNATAKA, SURATHKAL"]).name
+    'NIT Surathkal'
+    >>> gazetteer.match(["IIIT HYDERABAD"]).name
+    'IIIT Hyderabad'
+    >>> gazetteer.match(["IIT HYDERABAD"]).name
+    'IIT Hyderabad'
+    >>> gazetteer.match(["BIRLA INSTITUTE OF TECHNOLOGY & SCIENCE, PILANI - HYDERABAD CAMPUS"]).name
+    'BITS Hyderabad'
+    >>> gazetteer.match(["BIRLA INSTITUTE OF TECHNOLOGY & SCIENCE, PILANI"]).name
+    'BITS Pilani'
+
+    Other lines are only consulted when the extracted text matches nothing,
+    and the margin holds across every text of a set:
+
+    >>> gazetteer.match(["IIT HYDERABAD"], fallback=["UNIVERSITY OF DELHI"]).name
+    'IIT Hyderabad'
+    >>> gazetteer.match(["STUDENT IDENTITY CARD"], fallback=["UNIVERSITY OF DELHI"]).name
+    'University of Delhi'
+    >>> gazetteer.match(["IIT HYDERABAD", "IIIT HYDERABAD"]) is None
+    True
+    """
+
+    def __init__(self, names: list[str]):
+        self.names: list[str] = []
+        self._keys: list[str] = []
+        self._owners: list[int] = []
+        for entry in names:
+            spellings = [part.strip() for part in entry.split("|") if part.strip()]
+            if not spellings:
+                continue
+            keys = [college_key(spelling) for spelling in spellings]
+            for key in keys[:]:
+                words = key.split()
+                if any(word in COLLEGE_ABBREVIATIONS for word in words):
+                    keys.append(expand_college_key(words))
+            for key in dict.fromkeys(key for key in keys if key):
+                self._keys.append(key)
+                self._owners.append(len(self.names))
+            self.names.append(spellings[0])
+
+        postings: dict[str, list[int]] = {}
+        grams = [college_grams(key) for key in self._keys]
+        for idx, key_grams in enumerate(grams):
+            for gram in key_grams:
+                postings.setdefault(gram, []).append(idx)
+        limit = max(COLLEGE_COMMON_GRAM_MIN, COLLEGE_COMMON_GRAM_SHARE * len(self._keys))
+        self._postings = {gram: ids for gram, ids in postings.items() if len(ids) <= limit}
+        self._gram_counts = [max(1, len(key_grams & self._postings.keys())) for key_grams in grams]
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def candidates(self, text: str, limit: int = COLLEGE_CANDIDATES, min_score: float = 0.0) -> list[CollegeMatch]:
+        key = college_key(text)
+        if len(key) < 3:
+            return []
+        campus = college_campus(text)
+        postings = self._postings
+        hits = Counter(chain.from_iterable(postings[gram] for gram in college_grams(key) if gram in postings))
+        shortlist = []
+        for idx, count in hits.items():
+            grams = self._gram_counts[idx]
+            if count < COLLEGE_MIN_CONTAINMENT * grams:
+                continue
+            # Each edit loses at most three trigrams (the padded ends match
+            # the word boundaries the name is aligned to), which bounds the
+            # score before any edit distance is computed.
+            min_distance = -(-max(0, grams - count) // 3)
+            if 1.0 - min_distance / len(self._keys[idx]) >= min_score:
+                shortlist.append(idx)
+        shortlist.sort(key=lambda idx: hits[idx] / self._gram_counts[idx], reverse=True)
+        best: dict[int, tuple[float, int]] = {}
+        campuses: set[int] = set()
+        for idx in shortlist[: limit * 2]:
+            spelling = self._keys[idx]
+            owner = self._owners[idx]
+            pattern = spelling
+            words = spelling.split()
+            if campus in words:
+                # The rest of the name need not sit next to the campus:
+                # "birla institute of technology and science pilani hyderabad campus".
+                rest = [word for word in words if word != campus]
+                if any(word not in COLLEGE_GENERIC_WORDS for word in rest):
+                    pattern = " ".join(rest)
+                    campuses.add(owner)
+            distance = word_distance(pattern, key)
+            # Ties go to the longer spelling: more of the text is explained.
+            rank = (1.0 - distance / len(spelling), len(spelling) - distance)
+            if owner not in best or rank > best[owner]:
+                best[owner] = rank
+        ranked = sorted(best.items(), key=lambda item: item[1], reverse=True)[:limit]
+        return [
+            CollegeMatch(self.names[owner], round(score, 3), matched, owner in campuses)
+            for owner, (score, matched) in ranked
         ]
-        word_count = len(cleaned.split())
-        if not any(keyword in lowered for keyword in keywords):
-            if word_count < 2 or len(cleaned) < 12:
+
+    def match(
+        self, texts: list[str], min_score: float = COLLEGE_MATCH_MIN_SCORE, fallback: list[str] = ()
+    ) -> CollegeMatch | None:
+        # The fallback texts are only tried when texts match nothing. Within
+        # one set, the winner must clear the margin over every other college
+        # found in any of its texts.
+        for group in (texts, fallback):
+            found: dict[str, CollegeMatch] = {}
+            for text in dict.fromkeys(text for text in group if text):
+                for candidate in self.candidates(text, COLLEGE_CANDIDATES, min_score - COLLEGE_MATCH_MARGIN):
+                    if candidate.name not in found or candidate.score > found[candidate.name].score:
+                        found[candidate.name] = candidate
+            ranked = sorted(found.values(), key=lambda candidate: candidate.score, reverse=True)
+            if any(candidate.campus and candidate.score >= min_score for candidate in ranked):
+                ranked = [candidate for candidate in ranked if candidate.campus]
+            if not ranked or ranked[0].score < min_score:
+                continue
+            if len(ranked) > 1 and ranked[0].score - ranked[1].score < COLLEGE_MATCH_MARGIN:
                 return None
-        return cleaned
+            return ranked[0]
+        return None
+
 
-    college_match = re.search(r"(?:College|University|Institute|Campus)[:\s-]*([A-Za-z0-9 .,'-]{4,})", text_clean, re.IGNORECASE)
+_college_gazetteer: CollegeGazetteer | None = None
+_college_gazetteer_lock = threading.Lock()
+
+
+def get_college_gazetteer() -> CollegeGazetteer:
+    global _college_gazetteer
+    with _college_gazetteer_lock:
+        if _college_gazetteer is None:
+            _college_gazetteer = CollegeGazetteer(load_college_names(COLLEGE_LIST_PATH))
+        return _college_gazetteer
+
+
+def parse_fields(text: str) -> dict:
+    text_clean = normalize_text(text)
+    lines = text_clean.split("\n")
+
+    # Single pass over the lines: every labelled field keeps the first line
+    # its rule accepts, exactly as if each rule had scanned from the top. A
+    # rule stops being tried once it, or a higher-priority rule for the same
+    # field, has matched, and the walk ends when no rule is left.
+    matches: dict[LabelRule, str] = {}
+    pending = list(LABEL_RULES)
+    for idx, line in enumerate(lines):
+        if not pending:
+            break
+        if not ANY_LABEL_RE.search(line):
+            continue
+        next_line = lines[idx + 1].strip() if idx + 1 < len(lines) else None
+        for rule in tuple(pending):
+            if rule not in pending or not rule.label.search(line):
+                continue
+            value = rule.extract(line, next_line)
+            if value is None:
+                continue
+            matches[rule] = value
+            rank = LABEL_RULES.index(rule)
+            pending = [
+                other for other in pending if other.field != rule.field or LABEL_RULES.index(other) < rank
+            ]
+
+    def first_match(field_name: str) -> str | None:
+        for rule in LABEL_RULES:
+            if rule.field == field_name and rule in matches:
+                return matches[rule]
+        return None
+
+    # Both of these want the first qualifying line; one search over the whole
+    # text finds it without another walk.
+    college_header = None
+    header_match = COLLEGE_HEADER_RE.search(text_clean)
+    if header_match:
+        college_header = header_match.group(1).strip()
+
+    header_lines = lines[:COLLEGE_SCAN_LINES]
+    affiliations = {line for line, flag in zip(header_lines, affiliation_lines(header_lines)) if flag}
+    college_line = None
+    for college_line_match in COLLEGE_LINE_RE.finditer(text_clean):
+        line = line_at(text_clean, college_line_match.start(), college_line_match.end())
+        if line not in affiliations:
+            college_line = line
+            break
+
+    name = first_match("name")
+    if name:
+        name = clean_trailing_labels(name)
+        if len(name) < 3:
+            name = None
+
+    hostel_id = first_match("student_id")
+
+    college = None
+    college_match = next(
+        (
+            match
+            for match in COLLEGE_INLINE_RE.finditer(text_clean)
+            if line_at(text_clean, match.start(), match.end()) not in affiliations
+        ),
+        None,
+    )
     if college_match:
         college = sanitize_college(college_match.group(1).strip())
     if not college and college_header:
         college = sanitize_college(college_header)
+    if not college and college_line is not None:
+        college = sanitize_college(college_line.strip())
     if not college:
-        for line in lines:
-            if re.search(r"\b(College|University|Institute)\b", line, re.IGNORECASE):
-                college = sanitize_college(line.strip())
-                break
-    if not college:
-        college = sanitize_college(infer_college_from_header())
-
-    dob = find_after_label(
-        r"\b(DOB|D\.O\.B\.|Date of Birth)\b",
-        r"(?:DOB|D\.O\.B\.|Date of Birth)[^0-9A-Za-z]{0,6}([0-3]?\d[\-/\s][01]?\d[\-/\s](?:19|20)?\d\d)",
-    )
-    if not dob:
-        dob = find_after_label(
-            r"\b(DOB|D\.O\.B\.|Date of Birth)\b",
-            r"(?:DOB|D\.O\.B\.|Date of Birth)[^0-9A-Za-z]{0,6}([0-3]?\d[\s\-/]*[A-Za-z]{3,9}[\s\-/]*(?:19|20)?\d\d)",
-        )
-        if dob:
-            dob = re.sub(r"\s+", "-", dob)
-
-    phone = find_after_label(
-        r"\b(Phone|Mobile|Contact|Emergency\s*Phone)\b",
-        r"(?:Phone|Mobile|Contact|Emergency\s*Phone)[:\s-]*([+]?\d[\d\s-]{7,})",
+        college = sanitize_college(infer_college_from_header([line for line in lines if line not in affiliations]))
+    # A close enough entry in the college list replaces the OCR spelling. The
+    # extracted text decides; other header lines only when it matches nothing.
+    college_score = None
+    snapped = get_college_gazetteer().match(
+        [college_header, college_line, college, college_match and college_match.group(0)],
+        fallback=[line for line in header_lines if line not in affiliations],
     )
-    if not phone:
-        phone_candidates = re.findall(r"\b\d{10}\b", text_clean)
-        if phone_candidates:
-            phone = phone_candidates[0]
-
-    hostel_match = re.search(r"(?:Hostel|Residence|Hall)[:\s]*([A-Z0-9-]{1,})", text_clean, re.IGNORECASE)
-    if hostel_match:
-        hostel = hostel_match.group(1).strip()
+    if snapped:
+        college, college_score = snapped.name, snapped.score
 
-    block_match = re.search(r"(?:Block)[:\s]*([A-Z0-9-]{1,})", text_clean, re.IGNORECASE)
-    if block_match:
-        block = block_match.group(1).strip()
+    dob = first_match("dob")
 
-    floor_match = re.search(r"(?:Floor)[:\s]*([A-Z0-9-]{1,})", text_clean, re.IGNORECASE)
-    if floor_match:
-        floor = floor_match.group(1).strip()
+    phone = first_match("phone")
+    if not phone:
+        phone_match = PHONE_DIGITS_RE.search(text_clean)
+        if phone_match:
+            phone = phone_match.group(0)
 
-    room_match = re.search(r"(?:Room)[:\s]*([A-Z0-9-]{1,})", text_clean, re.IGNORECASE)
-    if room_match:
-        room = room_match.group(1).strip()
+    # Case-insensitive patterns without a literal prefix are slow to scan, so
+    # skip them when their keyword is absent. Only exact for ASCII text, where
+    # str.lower() and re.IGNORECASE agree; anything else is always scanned.
+    text_lower = text_clean.lower() if text_clean.isascii() else None
 
-    if not hostel:
-        hostel_inline = re.search(r"Hostel\s*([A-Z0-9-]{1,})", text_clean, re.IGNORECASE)
-        if hostel_inline:
-            hostel = hostel_inline.group(1).strip()
+    def capture(pattern: re.Pattern, keywords: tuple[str, ...]) -> str | None:
+        if text_lower is not None and not any(keyword in text_lower for keyword in keywords):
+            return None
+        match = pattern.search(text_clean)
+        return match.group(1).strip() if match else None
 
-    if not room:
-        room_inline = re.search(r"Room\s*([A-Z0-9-]{1,})", text_clean, re.IGNORECASE)
-        if room_inline:
-            room = room_inline.group(1).strip()
+    hostel = capture(HOSTEL_RE, ("hostel", "residence", "hall"))
+    block = capture(BLOCK_RE, ("block",))
+    floor = capture(FLOOR_RE, ("floor",))
+    room = capture(ROOM_RE, ("room",))
 
     if not hostel_id:
-        id_candidates = re.findall(r"\b[A-Z]{0,3}\d{2}[A-Z]{1,4}\d{2,4}\b", text_clean)
-        if id_candidates:
-            hostel_id = id_candidates[0]
+        id_match = ID_SHAPE_RE.search(text_clean)
+        if id_match:
+            hostel_id = id_match.group(0)
 
     if not hostel_id:
-        generic_ids = re.findall(r"\b[A-Z0-9-]{6,}\b", text_clean)
-        blacklist = {"STUDENT", "COLLEGE", "ENGINEERING", "CARD", "UNIVERSITY", "INSTITUTE"}
-        for candidate in generic_ids:
-            if candidate.upper() in blacklist:
+        for candidate_match in GENERIC_ID_RE.finditer(text_clean):
+            candidate = candidate_match.group(0)
+            if candidate.upper() in GENERIC_ID_BLACKLIST:
                 continue
             if any(char.isdigit() for char in candidate) and any(char.isalpha() for char in candidate):
                 hostel_id = candidate
@@ -342,6 +1454,7 @@ def parse_fields(text: str) -> dict:
         "name": name,
         "student_id": hostel_id,
         "college": college,
+        "college_score": college_score,
         "hostel": hostel,
         "block": block,
         "floor": floor,
@@ -352,221 +1465,1028 @@ def parse_fields(text: str) -> dict:
     }
 
 
-def ocr_best(image: cv2.typing.MatLike) -> str:
-    rotations = [
-        (0, image),
-        (90, cv2.rotate(image, cv2.ROTATE_90_CLOCKWISE)),
-        (180, cv2.rotate(image, cv2.ROTATE_180)),
-        (270, cv2.rotate(image, cv2.ROTATE_90_COUNTERCLOCKWISE)),
-    ]
-
-    best_text = ""
-    best_score = -1.0
+QR_FIELD_ALIASES = {
+    "name": "name",
+    "fullname": "name",
+    "studentname": "name",
+    "usn": "student_id",
+    "regno": "student_id",
+    "registrationno": "student_id",
+    "registrationnumber": "student_id",
+    "rollno": "student_id",
+    "rollnumber": "student_id",
+    "enrollmentno": "student_id",
+    "enrollmentnumber": "student_id",
+    "studentid": "student_id",
+    "dob": "dob",
+    "dateofbirth": "dob",
+    "birthdate": "dob",
+    "phone": "phone",
+    "phoneno": "phone",
+    "mobile": "phone",
+    "mobileno": "phone",
+    "contact": "phone",
+    "college": "college",
+    "collegename": "college",
+    "institution": "college",
+    "institute": "college",
+    "university": "college",
+    "hostel": "hostel",
+    "block": "block",
+    "floor": "floor",
+    "room": "room",
+}
+QR_KEY_VALUE_SPLIT_RE = re.compile(r"[\n;|&]+")
+QR_KEY_VALUE_RE = re.compile(r"^\s*([A-Za-z][A-Za-z _.-]*?)\s*[=:]\s*(.+?)\s*$")
+
+# Tried in order; the first parser returning fields wins. Register new
+# college formats with @qr_parser.
+QR_PARSERS: list[Callable[[str], dict | None]] = []
+
+
+def qr_parser(func: Callable[[str], dict | None]) -> Callable[[str], dict | None]:
+    QR_PARSERS.append(func)
+    return func
+
+
+def canonical_qr_fields(raw: dict) -> dict:
+    fields = {}
+    for key, value in raw.items():
+        name = QR_FIELD_ALIASES.get(re.sub(r"[^a-z]", "", str(key).lower()))
+        if name and name not in fields and value not in (None, "") and not isinstance(value, (dict, list)):
+            fields[name] = str(value).strip()
+    return fields
+
+
+@qr_parser
+def parse_json_qr(payload: str) -> dict | None:
+    if not payload.lstrip().startswith("{"):
+        return None
+    try:
+        data = json.loads(payload)
+    except ValueError:
+        return None
+    return canonical_qr_fields(data) if isinstance(data, dict) else None
 
-    for _, rotated in rotations:
-        gray = cv2.cvtColor(rotated, cv2.COLOR_BGR2GRAY)
-        gray = cv2.bilateralFilter(gray, 9, 75, 75)
-        thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
 
-        data = pytesseract.image_to_data(thresh, output_type=pytesseract.Output.DICT)
-        texts = [t for t in data.get("text", []) if t.strip()]
-        confs = [float(c) for c in data.get("conf", []) if c != "-1"]
-        score = (sum(confs) / len(confs)) if confs else 0.0
+@qr_parser
+def parse_aadhaar_xml_qr(payload: str) -> dict | None:
+    # Pre-2018 Aadhaar QR: <PrintLetterBarcodeData uid=".." name=".." dob=".." .../>
+    if "<PrintLetterBarcodeData" not in payload:
+        return None
+    try:
+        element = ElementTree.fromstring(payload[payload.index("<PrintLetterBarcodeData") :])
+    except ElementTree.ParseError:
+        return None
+    fields = canonical_qr_fields(element.attrib)
+    fields["doc_type"] = "aadhaar"
+    return fields
 
-        base_text = pytesseract.image_to_string(thresh)
-        psm6_text = pytesseract.image_to_string(thresh, config="--oem 1 --psm 6")
-        psm11_text = pytesseract.image_to_string(thresh, config="--oem 1 --psm 11")
-        text = " ".join(texts) + "\n" + base_text + "\n" + psm6_text + "\n" + psm11_text
-        if score > best_score and len(text.strip()) > 20:
-            best_score = score
-            best_text = text
 
-    return best_text
+@qr_parser
+def parse_url_qr(payload: str) -> dict | None:
+    # Covers the hostel's own location QR codes (/issues/new?hostel=..&room=..).
+    parts = urlsplit(payload.strip())
+    if parts.scheme not in ("http", "https") or not parts.query:
+        return None
+    return canonical_qr_fields(dict(parse_qsl(parts.query)))
+
+
+@qr_parser
+def parse_key_value_qr(payload: str) -> dict | None:
+    raw = {}
+    for chunk in QR_KEY_VALUE_SPLIT_RE.split(payload):
+        match = QR_KEY_VALUE_RE.match(chunk)
+        if match:
+            raw.setdefault(match.group(1), match.group(2))
+    fields = canonical_qr_fields(raw)
+    # A single stray "x: y" is more likely free text than a structured payload.
+    return fields if len(fields) >= 2 else None
+
+
+def parse_qr_payload(payload: str | None) -> dict:
+    if not payload:
+        return {}
+    for parser in QR_PARSERS:
+        fields = parser(payload)
+        if fields:
+            return fields
+    return {}
+
+
+def extract_fields(ocr_text: str, qr_data: str | None, header_text: str | None) -> dict:
+    # Structured QR values are exact, so they win over anything parsed from
+    # OCR text.
+    with profile_stage("parse"):
+        fields = parse_fields(compose_text(ocr_text, qr_data, header_text))
+        qr_fields = parse_qr_payload(qr_data)
+        fields.update(qr_fields)
+        if qr_fields.get("college"):
+            # college_score belonged to the OCR reading the QR just replaced.
+            snapped = get_college_gazetteer().match([qr_fields["college"]])
+            fields["college"] = snapped.name if snapped else qr_fields["college"]
+            fields["college_score"] = snapped.score if snapped else None
+    return fields
+
+
+def compose_text(ocr_text: str, qr_data: str | None, header_text: str | None) -> str:
+    combined_text = ocr_text + ("\n" + qr_data if qr_data else "")
+    if header_text:
+        combined_text += "\nCOLLEGE_HEADER: " + header_text
+    return combined_text
 
 
-def extract_prominent_header(image: cv2.typing.MatLike) -> str | None:
-    rotations = [
-        image,
-        cv2.rotate(image, cv2.ROTATE_90_CLOCKWISE),
-        cv2.rotate(image, cv2.ROTATE_180),
-        cv2.rotate(image, cv2.ROTATE_90_COUNTERCLOCKWISE),
-    ]
+QR_DECODE_MAX_SIDE = 1000
+# A downscaled first try only pays off when it shrinks the image clearly; a
+# 300 DPI card (~1011 px) is decoded as is.
+QR_DOWNSCALE_MIN_RATIO = 1.25
+# Only QR codes are decoded: the hostel's codes and structured college
+# payloads are QR, and restricting zbar's symbologies makes misses cheap.
 
-    address_terms = {
-        "layout",
-        "road",
-        "rd",
-        "street",
-        "st",
-        "nagar",
-        "colony",
-        "district",
-        "state",
-        "pin",
-        "pincode",
-        "bangalore",
-        "bengaluru",
-        "karnataka",
-        "india",
-        "po",
-        "phone",
-    }
-    keyword_terms = {"college", "university", "institute", "institutions", "engineering", "school", "campus"}
-
-    best_text = None
-    best_score = -1.0
-
-    for rotated in rotations:
-        height = rotated.shape[0]
-        top_cut = int(height * 0.35)
-        region = rotated[:top_cut, :]
-
-        gray = cv2.cvtColor(region, cv2.COLOR_BGR2GRAY)
-        gray = cv2.bilateralFilter(gray, 9, 75, 75)
-        thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
-
-        for config in ("--oem 1 --psm 6", "--oem 1 --psm 11", "--oem 1 --psm 7"):
-            data = pytesseract.image_to_data(thresh, output_type=pytesseract.Output.DICT, config=config)
-            words = data.get("text", [])
-            heights = data.get("height", [])
-            tops = data.get("top", [])
-            confs = data.get("conf", [])
-            line_nums = data.get("line_num", [])
-            block_nums = data.get("block_num", [])
-            par_nums = data.get("par_num", [])
-
-            lines_map: dict[tuple[int, int, int], list[tuple[str, int, int, float]]] = {}
-            for idx, word in enumerate(words):
-                text = word.strip()
-                if not text:
-                    continue
-                conf = float(confs[idx]) if confs[idx] != "-1" else 0.0
-                key = (block_nums[idx], par_nums[idx], line_nums[idx])
-                lines_map.setdefault(key, []).append((text, heights[idx], tops[idx], conf))
-
-            for _, items in lines_map.items():
-                texts = [item[0] for item in items]
-                line_text = " ".join(texts)
-                avg_height = sum(item[1] for item in items) / len(items)
-                avg_top = sum(item[2] for item in items) / len(items)
-                avg_conf = sum(item[3] for item in items) / len(items)
-
-                if avg_conf < 30:
-                    continue
-                if avg_top > top_cut * 0.9:
-                    continue
-
-                cleaned = re.sub(r"[^A-Za-z&.,'\s-]", " ", line_text)
-                cleaned = re.sub(r"\s{2,}", " ", cleaned).strip()
-                if len(cleaned) < 6:
-                    continue
-
-                lowered = cleaned.lower()
-                if any(term in lowered for term in address_terms):
-                    continue
-
-                letters = sum(ch.isalpha() for ch in cleaned)
-                letters_ratio = letters / max(len(cleaned), 1)
-                keywords = [term for term in keyword_terms if term in lowered]
-
-                score = avg_height * 2
-                score += letters_ratio * 10
-                if avg_conf > 60:
-                    score += 5
-                if "college of" in lowered:
-                    score += 30
-                if keywords:
-                    score += 20
-                if sum(ch.isdigit() for ch in cleaned) >= 3:
-                    score -= 10
-
-                if score > best_score:
-                    best_score = score
-                    best_text = cleaned
-
-    return best_text or None
-
-
-def scan_camera(camera_index: int = 0) -> ScanResult:
-    cap = cv2.VideoCapture(camera_index)
-    if not cap.isOpened():
-        raise RuntimeError("Unable to open camera")
 
-    last_ocr = 0
-    ocr_text = ""
-    qr_data = None
+def qr_scales(gray: cv2.typing.MatLike):
+    side = max(gray.shape[:2])
+    if side > QR_DECODE_MAX_SIDE * QR_DOWNSCALE_MIN_RATIO:
+        scale = QR_DECODE_MAX_SIDE / side
+        yield cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    yield gray
+    if side <= QR_DECODE_MAX_SIDE * 1.5:
+        yield cv2.resize(gray, None, fx=2.0, fy=2.0, interpolation=cv2.INTER_CUBIC)
 
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
 
-        barcodes = pyzbar.decode(frame)
+def decode_qr(gray: cv2.typing.MatLike) -> str | None:
+    # Cheapest scale first; larger scales are only tried after a miss.
+    for scaled in qr_scales(gray):
+        barcodes = pyzbar.decode(scaled, symbols=[pyzbar.ZBarSymbol.QRCODE])
         if barcodes:
-            qr_data = barcodes[0].data.decode("utf-8", errors="ignore")
+            return barcodes[0].data.decode("utf-8", errors="ignore")
+    return None
 
-        now = time.time()
-        if now - last_ocr > 1.5:
-            last_ocr = now
-            ocr_text = ocr_best(frame)
 
-        overlay = frame.copy()
-        cv2.putText(overlay, "Press Q to quit", (16, 28), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 200, 255), 2)
-        if qr_data:
-            cv2.putText(overlay, f"QR: {qr_data[:40]}", (16, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 100), 2)
-        cv2.imshow("ID Card Scanner", overlay)
+# Large photos are decoded at 1/2, 1/4 or 1/8 scale (JPEG DCT scaling) as long
+# as the long side stays at or above this, so a 40MB upload never
+# materializes a full-resolution BGR array.
+DECODE_MIN_SIDE = 2000
+REDUCED_READ_FLAGS = ((8, "IMREAD_REDUCED_COLOR_8"), (4, "IMREAD_REDUCED_COLOR_4"), (2, "IMREAD_REDUCED_COLOR_2"))
 
-        if cv2.waitKey(1) & 0xFF in (ord("q"), ord("Q")):
-            break
 
-    cap.release()
-    cv2.destroyAllWindows()
-
-    header_text = extract_prominent_header(frame)
-    combined_text = ocr_text + ("\n" + qr_data if qr_data else "")
-    if header_text:
-        combined_text += "\nCOLLEGE_HEADER: " + header_text
-    fields = parse_fields(combined_text)
-    return ScanResult(
-        raw_text=ocr_text,
-        qr_data=qr_data,
-        name=fields.get("name"),
-        hostel_id=fields.get("student_id"),
-        hostel=fields.get("hostel"),
-        college=fields.get("college"),
-        block=fields.get("block"),
-        floor=fields.get("floor"),
-        room=fields.get("room"),
-        dob=fields.get("dob"),
-        phone=fields.get("phone"),
-        doc_type=fields.get("doc_type"),
-    )
+def image_dimensions(data: bytes) -> tuple[int, int] | None:
+    # Reads width/height from PNG or JPEG headers without decoding pixels.
+    if data[:8] == b"\x89PNG\r\n\x1a\n" and len(data) >= 24:
+        return int.from_bytes(data[16:20], "big"), int.from_bytes(data[20:24], "big")
+    if data[:2] != b"\xff\xd8":
+        return None
+    offset = 2
+    while offset + 9 <= len(data):
+        if data[offset] != 0xFF:
+            return None
+        marker = data[offset + 1]
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            offset += 2
+            continue
+        length = int.from_bytes(data[offset + 2 : offset + 4], "big")
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height = int.from_bytes(data[offset + 5 : offset + 7], "big")
+            width = int.from_bytes(data[offset + 7 : offset + 9], "big")
+            return width, height
+        offset += 2 + length
+    return None
+
+
+def decode_image(data: bytes) -> cv2.typing.MatLike:
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    flag = cv2.IMREAD_COLOR
+    dimensions = image_dimensions(data)
+    if dimensions:
+        long_side = max(dimensions)
+        for factor, reduced in REDUCED_READ_FLAGS:
+            if long_side // factor >= DECODE_MIN_SIDE:
+                flag = getattr(cv2, reduced)
+                break
+    image = cv2.imdecode(buffer, flag)
+    if image is None:
+        raise RuntimeError("Unable to read image")
+    return image
 
 
-def scan_image(image_path: str) -> ScanResult:
-    path = Path(image_path)
+def load_image(source: str | bytes) -> cv2.typing.MatLike:
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return decode_image(bytes(source))
+    path = Path(source)
     if not path.exists():
         raise RuntimeError("Image file not found")
+    return decode_image(path.read_bytes())
+
+
+# ISO/IEC 7810 ID-1, the size of nearly every student, Aadhaar and PAN card.
+CARD_SIZE_MM = (85.6, 53.98)
+CARD_TARGET_DPI = 300
+CARD_DETECT_MAX_SIDE = 800
+CARD_MIN_AREA_RATIO = 0.2
+# A quad whose sides are further than this from the ID-1 aspect ratio (in
+# either orientation) is a photo, a table edge or a half-found card.
+CARD_ASPECT_TOLERANCE = 0.15
+FALLBACK_MAX_SIDE = 2000
+
+
+def order_corners(points: np.ndarray) -> np.ndarray:
+    # top-left, top-right, bottom-right, bottom-left
+    sums = points.sum(axis=1)
+    diffs = np.diff(points, axis=1).ravel()
+    return np.array(
+        [points[np.argmin(sums)], points[np.argmin(diffs)], points[np.argmax(sums)], points[np.argmax(diffs)]],
+        dtype=np.float32,
+    )
 
-    image = cv2.imread(str(path))
-    if image is None:
-        raise RuntimeError("Unable to read image")
 
-    qr_data = None
-    barcodes = pyzbar.decode(image)
-    if barcodes:
-        qr_data = barcodes[0].data.decode("utf-8", errors="ignore")
+def has_card_aspect(quad: np.ndarray) -> bool:
+    # Opposite sides are averaged so moderate perspective still passes.
+    width = (np.linalg.norm(quad[1] - quad[0]) + np.linalg.norm(quad[2] - quad[3])) / 2
+    height = (np.linalg.norm(quad[3] - quad[0]) + np.linalg.norm(quad[2] - quad[1])) / 2
+    if min(width, height) <= 0:
+        return False
+    aspect = max(width, height) / min(width, height)
+    return abs(aspect / (CARD_SIZE_MM[0] / CARD_SIZE_MM[1]) - 1) <= CARD_ASPECT_TOLERANCE
 
-    ocr_text = ocr_best(image)
-    header_text = extract_prominent_header(image)
 
-    combined_text = ocr_text + ("\n" + qr_data if qr_data else "")
-    if header_text:
-        combined_text += "\nCOLLEGE_HEADER: " + header_text
-    fields = parse_fields(combined_text)
+def find_card_quad(image: cv2.typing.MatLike) -> np.ndarray | None:
+    height, width = image.shape[:2]
+    scale = min(1.0, CARD_DETECT_MAX_SIDE / max(height, width))
+    small = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1 else image
+
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    gray = cv2.GaussianBlur(gray, (5, 5), 0)
+    edges = cv2.Canny(gray, 50, 150)
+    edges = cv2.dilate(edges, np.ones((3, 3), np.uint8), iterations=1)
+
+    contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    min_area = CARD_MIN_AREA_RATIO * small.shape[0] * small.shape[1]
+    for contour in sorted(contours, key=cv2.contourArea, reverse=True)[:5]:
+        if cv2.contourArea(contour) < min_area:
+            break
+        approx = cv2.approxPolyDP(contour, 0.02 * cv2.arcLength(contour, True), True)
+        if len(approx) == 4 and cv2.isContourConvex(approx):
+            quad = order_corners(approx.reshape(4, 2).astype(np.float32) / scale)
+            if has_card_aspect(quad):
+                return quad
+    return None
+
+
+def normalize_card(image: cv2.typing.MatLike) -> cv2.typing.MatLike:
+    """Crop the card out of the photo and resample it to CARD_TARGET_DPI.
+
+    Everything downstream (denoise, Otsu, Tesseract, barcode decoding) then
+    works on a card-sized image instead of a full phone photo. When no card
+    outline with the card's proportions is found the whole image is kept,
+    only capped in size.
+    """
+    quad = find_card_quad(image)
+    if quad is None:
+        height, width = image.shape[:2]
+        scale = FALLBACK_MAX_SIDE / max(height, width)
+        if scale < 1:
+            return cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        return image
+
+    top_width = np.linalg.norm(quad[1] - quad[0])
+    side_height = np.linalg.norm(quad[3] - quad[0])
+    long_px = round(CARD_SIZE_MM[0] / 25.4 * CARD_TARGET_DPI)
+    short_px = round(CARD_SIZE_MM[1] / 25.4 * CARD_TARGET_DPI)
+    # Portrait cards stay portrait; upright orientation is resolved later.
+    width, height = (long_px, short_px) if top_width >= side_height else (short_px, long_px)
+
+    target = np.array([[0, 0], [width - 1, 0], [width - 1, height - 1], [0, height - 1]], dtype=np.float32)
+    matrix = cv2.getPerspectiveTransform(quad, target)
+    return cv2.warpPerspective(image, matrix, (width, height), flags=cv2.INTER_AREA)
+
+
+ROTATIONS = {
+    0: None,
+    90: "ROTATE_90_CLOCKWISE",
+    180: "ROTATE_180",
+    270: "ROTATE_90_COUNTERCLOCKWISE",
+}
+
+# Tesseract reports orientation confidence on an open scale; below this the
+# OSD guess is treated as unreliable and every rotation is OCR'd instead.
+ORIENTATION_MIN_CONFIDENCE = 2.0
+OSD_MAX_SIDE = 1600
+
+
+HEADER_FRACTION = 0.35
+LINE_KERNEL_DIVISOR = 40
+LINE_MIN_HEIGHT = 8
+LINE_MAX_HEIGHT_RATIO = 0.12
+LINE_MAX_FILL = 0.85
+CROP_PADDING = 8
+
+
+def rotate_image(image: cv2.typing.MatLike, angle: int) -> cv2.typing.MatLike:
+    code = ROTATIONS[angle]
+    return image if code is None else cv2.rotate(image, getattr(cv2, code))
+
+
+class PreprocessPipeline:
+    """Lazily computed, memoized preprocessing stages for one scanned image.
+
+    Stages run once on the upright (0 degree) pixels: gray -> denoise ->
+    binarize. Right-angle rotations commute with all three up to rounding
+    (the bilateral kernel is symmetric and Otsu only looks at the
+    histogram), so a rotated stage is the cached stage rotated rather than
+    a recomputation.
+    """
+
+    def __init__(self, image: cv2.typing.MatLike):
+        self.image = image
+        self._stages: dict[tuple, cv2.typing.MatLike] = {}
+        # Stages are requested concurrently by OCR workers; building under a
+        # (re-entrant, since stages nest) lock keeps each one computed once.
+        self._lock = threading.RLock()
+
+    def _stage(self, key: tuple, build) -> cv2.typing.MatLike:
+        with self._lock:
+            if key not in self._stages:
+                with profile_stage(f"preprocess[{key[0]}]"):
+                    self._stages[key] = build()
+            return self._stages[key]
+
+    def _rotated(self, name: str, angle: int, build) -> cv2.typing.MatLike:
+        upright = self._stage((name, 0), build)
+        if angle == 0:
+            return upright
+        return self._stage((name, angle), lambda: rotate_image(upright, angle))
+
+    def gray(self, angle: int = 0) -> cv2.typing.MatLike:
+        return self._rotated("gray", angle, lambda: cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY))
+
+    def denoised(self, angle: int = 0) -> cv2.typing.MatLike:
+        return self._rotated("denoised", angle, lambda: cv2.bilateralFilter(self.gray(), 9, 75, 75))
+
+    def binary(self, angle: int = 0) -> cv2.typing.MatLike:
+        return self._rotated("binary", angle, lambda: otsu(self.denoised()))
+
+    def header_cut(self, angle: int = 0) -> int:
+        return int(self.denoised(angle).shape[0] * HEADER_FRACTION)
+
+    def text_lines(self, angle: int = 0) -> list[tuple[int, int, int, int]]:
+        return self._stage(("text_lines", angle), lambda: detect_text_lines(self.binary(angle)))
+
+    def line_crop(self, angle: int, box: tuple[int, int, int, int]) -> cv2.typing.MatLike:
+        left, top, right, bottom = box
+        crop = self.binary(angle)[top:bottom, left:right]
+        return cv2.copyMakeBorder(
+            crop, CROP_PADDING, CROP_PADDING, CROP_PADDING, CROP_PADDING, cv2.BORDER_CONSTANT, value=255
+        )
+
+    def header_binary(self, angle: int = 0) -> cv2.typing.MatLike:
+        # The header crop gets its own Otsu threshold, but reuses the
+        # already-denoised pixels of the full image.
+        return self._stage(
+            ("header_binary", angle),
+            lambda: otsu(self.denoised(angle)[: self.header_cut(angle), :]),
+        )
+
+
+def otsu(gray: cv2.typing.MatLike) -> cv2.typing.MatLike:
+    return cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+
+
+def detect_text_lines(binary: cv2.typing.MatLike) -> list[tuple[int, int, int, int]]:
+    # Closing the ink with a wide, flat kernel fuses the characters of a line
+    # into one blob. Blobs too tall (photo, logo) or too solid (colour bands)
+    # to be a line of text are dropped. Boxes are (left, top, right, bottom).
+    height, width = binary.shape[:2]
+    ink = cv2.bitwise_not(binary)
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (max(9, width // LINE_KERNEL_DIVISOR), 3))
+    blobs = cv2.morphologyEx(ink, cv2.MORPH_CLOSE, kernel)
+    contours, _ = cv2.findContours(blobs, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    boxes = []
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        if h < LINE_MIN_HEIGHT or h > height * LINE_MAX_HEIGHT_RATIO or w < 2 * h:
+            continue
+        if cv2.countNonZero(ink[y : y + h, x : x + w]) > LINE_MAX_FILL * w * h:
+            continue
+        boxes.append((x, y, x + w, y + h))
+    return sorted(boxes, key=lambda box: (box[1], box[0]))
+
+
+def resolve_orientation(pipeline: PreprocessPipeline) -> int | None:
+    gray = pipeline.gray()
+    with profile_stage("orientation"):
+        scale = OSD_MAX_SIDE / max(gray.shape[:2])
+        if scale < 1:
+            gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+        try:
+            osd = call_tesseract(get_ocr_backend().orientation, gray)
+        except DeadlineExceeded:
+            return None
+    if osd is None:
+        return None
+
+    angle = int(osd.get("rotate", 0)) % 360
+    confidence = float(osd.get("orientation_conf", 0.0))
+    if angle not in ROTATIONS or confidence < ORIENTATION_MIN_CONFIDENCE:
+        return None
+    return angle
+
+
+@dataclass
+class OcrWord:
+    text: str
+    left: int
+    top: int
+    width: int
+    height: int
+    conf: float
+    block: int
+    par: int
+    line: int
+
+
+@dataclass
+class OcrLine:
+    words: list[OcrWord]
+
+    @property
+    def text(self) -> str:
+        return " ".join(word.text for word in self.words)
+
+    @property
+    def avg_height(self) -> float:
+        return sum(word.height for word in self.words) / len(self.words)
+
+    @property
+    def avg_top(self) -> float:
+        return sum(word.top for word in self.words) / len(self.words)
+
+    @property
+    def avg_conf(self) -> float:
+        return sum(max(word.conf, 0.0) for word in self.words) / len(self.words)
+
+    @property
+    def top(self) -> int:
+        return min(word.top for word in self.words)
+
+    @property
+    def bottom(self) -> int:
+        return max(word.top + word.height for word in self.words)
+
+    @property
+    def left(self) -> int:
+        return min(word.left for word in self.words)
+
+    @property
+    def right(self) -> int:
+        return max(word.left + word.width for word in self.words)
+
+    def overlaps(self, other: "OcrLine") -> bool:
+        # Same physical line: at least half of the shorter line's height is
+        # shared, and the horizontal extents intersect.
+        shared = min(self.bottom, other.bottom) - max(self.top, other.top)
+        if shared < 0.5 * min(self.bottom - self.top, other.bottom - other.top):
+            return False
+        return min(self.right, other.right) > max(self.left, other.left)
+
+
+@dataclass
+class OcrLayout:
+    """Word boxes from one image_to_data pass, grouped into Tesseract lines.
+
+    Coordinates are in the pixel space of the (rotated) image that was
+    OCR'd, so positional heuristics can query it without re-running OCR.
+    """
+
+    words: list[OcrWord]
+
+    @classmethod
+    def from_data(cls, data: dict) -> "OcrLayout":
+        words = []
+        for idx, raw in enumerate(data.get("text", [])):
+            text = str(raw).strip()
+            if not text:
+                continue
+            words.append(
+                OcrWord(
+                    text=text,
+                    left=int(data["left"][idx]),
+                    top=int(data["top"][idx]),
+                    width=int(data["width"][idx]),
+                    height=int(data["height"][idx]),
+                    conf=float(data["conf"][idx]),
+                    block=int(data["block_num"][idx]),
+                    par=int(data["par_num"][idx]),
+                    line=int(data["line_num"][idx]),
+                )
+            )
+        return cls(words=words)
+
+    @classmethod
+    def from_dict(cls, payload: dict) -> "OcrLayout":
+        return cls(words=[OcrWord(**word) for word in payload["words"]])
+
+    def to_dict(self) -> dict:
+        return {"words": [asdict(word) for word in self.words]}
+
+    @cached_property
+    def lines(self) -> list[OcrLine]:
+        grouped: dict[tuple[int, int, int], list[OcrWord]] = {}
+        for word in self.words:
+            grouped.setdefault((word.block, word.par, word.line), []).append(word)
+        return [OcrLine(words=items) for items in grouped.values()]
+
+    @property
+    def text(self) -> str:
+        return "\n".join(line.text for line in self.lines)
+
+    def line_confidences(self) -> list[dict]:
+        return [{"text": line.text, "conf": round(line.avg_conf, 1)} for line in self.lines]
+
+    def token_confidences(self) -> dict[str, float]:
+        confidences: dict[str, float] = {}
+        for word in self.words:
+            for token in field_tokens(word.text):
+                confidences[token] = max(confidences.get(token, 0.0), word.conf)
+        return confidences
+
+    @property
+    def mean_confidence(self) -> float:
+        confs = [word.conf for word in self.words if word.conf >= 0]
+        return (sum(confs) / len(confs)) if confs else 0.0
+
+
+@dataclass
+class OcrResult:
+    """All OCR passes run on the selected rotation, first pass first."""
+
+    layouts: list[OcrLayout] = field(default_factory=list)
+    angle: int | None = None
+
+    @property
+    def layout(self) -> OcrLayout | None:
+        return self.layouts[0] if self.layouts else None
+
+    @property
+    def score(self) -> float:
+        return self.layout.mean_confidence if self.layout else -1.0
+
+    @property
+    def lines(self) -> list[OcrLine]:
+        return merge_layout_lines(self.layouts)
+
+    @property
+    def text(self) -> str:
+        return "\n".join(line.text for line in self.lines)
+
+    def line_confidences(self) -> list[dict]:
+        return [{"text": line.text, "conf": round(line.avg_conf, 1)} for line in self.lines]
+
+    @classmethod
+    def from_dict(cls, payload: dict) -> "OcrResult":
+        return cls(layouts=[OcrLayout.from_dict(layout) for layout in payload["layouts"]], angle=payload["angle"])
+
+    def to_dict(self) -> dict:
+        return {"angle": self.angle, "layouts": [layout.to_dict() for layout in self.layouts]}
+
+
+def merge_layout_lines(layouts: list[OcrLayout]) -> list[OcrLine]:
+    """Merge the lines of several passes into one consensus transcript.
+
+    Passes are folded in from most to least confident. A line that matches
+    an already kept line (see OcrLine.overlaps) replaces it only if it was
+    read with higher confidence and spans at least 90% of its width, so a
+    sparse-mode fragment never displaces a full line. Lines no earlier pass
+    found are added. The result is in reading order.
+    """
+    merged: list[OcrLine] = []
+    for layout in sorted(layouts, key=lambda layout: layout.mean_confidence, reverse=True):
+        previous = len(merged)
+        for line in layout.lines:
+            match = next((idx for idx in range(previous) if merged[idx].overlaps(line)), None)
+            if match is None:
+                merged.append(line)
+                continue
+            kept = merged[match]
+            if line.avg_conf > kept.avg_conf and (line.right - line.left) >= 0.9 * (kept.right - kept.left):
+                merged[match] = line
+
+    # Group lines whose vertical centre falls inside the current row, then
+    # read each row left to right.
+    ordered: list[OcrLine] = []
+    row: list[OcrLine] = []
+    for line in sorted(merged, key=lambda line: line.top):
+        if row and (line.top + line.bottom) / 2 > min(item.bottom for item in row):
+            ordered.extend(sorted(row, key=lambda item: item.left))
+            row = []
+        row.append(line)
+    ordered.extend(sorted(row, key=lambda item: item.left))
+    return ordered
+
+
+def field_tokens(text: str) -> list[str]:
+    return re.findall(r"[A-Za-z0-9]+", text.upper())
+
+
+OCR_WORKERS = max(1, int(os.environ.get("OCR_WORKERS", min(4, os.cpu_count() or 1))))
+_ocr_executor: ThreadPoolExecutor | None = None
+_ocr_executor_lock = threading.Lock()
+
+
+def configure_ocr_workers(count: int) -> None:
+    global OCR_WORKERS, _ocr_executor
+    count = max(1, count)
+    with _ocr_executor_lock:
+        if count != OCR_WORKERS and _ocr_executor is not None:
+            _ocr_executor.shutdown(wait=True)
+            _ocr_executor = None
+        OCR_WORKERS = count
+
+
+@dataclass(frozen=True)
+class OcrJob:
+    angle: int
+    config: str = ""
+    header: bool = False
+    box: tuple[int, int, int, int] | None = None
+
+
+def run_ocr_job(pipeline: PreprocessPipeline, job: OcrJob) -> dict:
+    if job.header:
+        image, stage = pipeline.header_binary(job.angle), "header_ocr"
+    elif job.box:
+        image, stage = pipeline.line_crop(job.angle, job.box), "line_ocr"
+    else:
+        image, stage = pipeline.binary(job.angle), "ocr"
+    with profile_stage(f"{stage}[{job.config or 'default'}]"):
+        data = call_tesseract(get_ocr_backend().image_to_data, image, config=job.config)
+    if job.box:
+        # Back to full-image coordinates, so crop words line up with the
+        # full-page passes when layouts are merged.
+        data["left"] = [int(left) + job.box[0] - CROP_PADDING for left in data["left"]]
+        data["top"] = [int(top) + job.box[1] - CROP_PADDING for top in data["top"]]
+    return data
+
+
+def run_ocr_jobs(pipeline: PreprocessPipeline, jobs: list[OcrJob]) -> list:
+    # Each Tesseract call is its own subprocess, so threads are enough to keep
+    # several cores busy. Results come back in job order either way, which
+    # keeps the concurrent path identical to the sequential one. Pool threads
+    # do not inherit context variables, so each job runs in a copy of the
+    # caller's context to keep profiling attached to the scan.
+    global _ocr_executor
+    if OCR_WORKERS <= 1 or len(jobs) <= 1:
+        return [run_ocr_job(pipeline, job) for job in jobs]
+    with _ocr_executor_lock:
+        if _ocr_executor is None:
+            _ocr_executor = ThreadPoolExecutor(max_workers=OCR_WORKERS, thread_name_prefix="ocr")
+        executor = _ocr_executor
+    contexts = [contextvars.copy_context() for _ in jobs]
+    return list(executor.map(lambda context, job: context.run(run_ocr_job, pipeline, job), contexts, jobs))
+
+
+def candidate_angles(angle: int | None) -> list[int]:
+    return [angle] if angle is not None else list(ROTATIONS)
+
+
+def ocr_best(pipeline: PreprocessPipeline, angle: int | None = None) -> OcrResult:
+    # The cheapest useful pass: one image_to_data, which yields text, word
+    # confidences and layout. With a known upright angle only that rotation
+    # is tried; otherwise (or if it yields too little text) every rotation
+    # gets this single pass and the most confident one wins.
+    layout = None
+    if angle is not None:
+        layout = OcrLayout.from_data(run_ocr_job(pipeline, OcrJob(angle)))
+        if len(layout.text.strip()) > 20:
+            return OcrResult(layouts=[layout], angle=angle)
+
+    rotations = [rotation for rotation in candidate_angles(None) if rotation != angle]
+    try:
+        results = run_ocr_jobs(pipeline, [OcrJob(rotation) for rotation in rotations])
+    except DeadlineExceeded:
+        # Out of time: a short read at the known angle beats nothing.
+        return OcrResult(layouts=[layout], angle=angle) if layout is not None else OcrResult()
+
+    best = OcrResult()
+    for rotation, data in zip(rotations, results):
+        layout = OcrLayout.from_data(data)
+        if layout.mean_confidence > best.score and len(layout.text.strip()) > 20:
+            best = OcrResult(layouts=[layout], angle=rotation)
+
+    return best
+
+
+# The header also drops contact lines; otherwise the body's own term lists.
+HEADER_ADDRESS_TERMS = ADDRESS_TERMS | {"phone"}
+HEADER_KEYWORD_TERMS = COLLEGE_NAME_KEYWORDS
+HEADER_OCR_CONFIGS = ("--oem 1 --psm 6", "--oem 1 --psm 11", "--oem 1 --psm 7")
+
+
+@dataclass
+class HeaderCandidate:
+    text: str
+    score: float
+    has_keyword: bool
+
+
+def score_header_line(line: OcrLine, top_cut: int) -> HeaderCandidate | None:
+    avg_conf = line.avg_conf
+    if avg_conf < 30:
+        return None
+    if line.avg_top > top_cut * 0.9:
+        return None
+
+    cleaned = re.sub(r"[^A-Za-z&.,'\s-]", " ", line.text)
+    cleaned = re.sub(r"\s{2,}", " ", cleaned).strip()
+    if len(cleaned) < 6:
+        return None
+
+    lowered = cleaned.lower()
+    if any(term in lowered for term in HEADER_ADDRESS_TERMS):
+        return None
+
+    letters = sum(ch.isalpha() for ch in cleaned)
+    letters_ratio = letters / max(len(cleaned), 1)
+    keywords = [term for term in HEADER_KEYWORD_TERMS if term in lowered]
+
+    score = line.avg_height * 2
+    score += letters_ratio * 10
+    if avg_conf > 60:
+        score += 5
+    if "college of" in lowered:
+        score += 30
+    if keywords:
+        score += 20
+    if sum(ch.isdigit() for ch in cleaned) >= 3:
+        score -= 10
+
+    return HeaderCandidate(text=cleaned, score=score, has_keyword=bool(keywords))
+
+
+def best_header(lines: list[OcrLine], top_cut: int, best: HeaderCandidate | None = None) -> HeaderCandidate | None:
+    for line in lines:
+        candidate = score_header_line(line, top_cut)
+        if candidate and (best is None or candidate.score > best.score):
+            best = candidate
+    return best
+
+
+def extract_prominent_header(
+    pipeline: PreprocessPipeline,
+    angle: int | None = None,
+    ocr: OcrResult | None = None,
+) -> str | None:
+    # The main OCR layout already covers the header region; only when it has
+    # no institution-like line there do we re-OCR the header crop.
+    best = None
+    if ocr is not None and ocr.layout is not None and ocr.angle is not None:
+        best = best_header(ocr.layout.lines, pipeline.header_cut(ocr.angle))
+        if best and best.has_keyword:
+            return best.text
+        angles = [ocr.angle]
+    else:
+        angles = candidate_angles(angle)
+
+    jobs = [OcrJob(rotation, config, header=True) for rotation in angles for config in HEADER_OCR_CONFIGS]
+    for job, data in zip(jobs, run_ocr_jobs(pipeline, jobs)):
+        best = best_header(OcrLayout.from_data(data).lines, pipeline.header_cut(job.angle), best)
+
+    return best.text if best else None
+
+
+REQUIRED_FIELDS = ("name", "dob", "phone", "student_id", "college")
+CASCADE_CONFIGS = ("--oem 1 --psm 6", "--oem 1 --psm 11")
+FIELD_MIN_CONFIDENCE = 60.0
+
+
+def unsettled_fields(fields: dict, layouts: list[OcrLayout]) -> list[str]:
+    # A field is settled once it has a value whose words were read with
+    # adequate confidence in at least one pass. Values whose words appear in
+    # no layout (QR payload, cleaned-up header) are taken as they are.
+    token_confs = [layout.token_confidences() for layout in layouts]
+    missing = []
+    for name in REQUIRED_FIELDS:
+        value = fields.get(name)
+        if not value:
+            missing.append(name)
+            continue
+        if name == "college" and fields.get("college_score"):
+            continue
+        best = None
+        tokens = field_tokens(value)
+        for confs in token_confs:
+            matched = [confs[token] for token in tokens if token in confs]
+            if matched:
+                best = max(best or 0.0, sum(matched) / len(matched))
+        if best is not None and best < FIELD_MIN_CONFIDENCE:
+            missing.append(name)
+    if fields.get("doc_type") in (None, "other"):
+        missing.append("doc_type")
+    return missing
+
+
+FIELD_OCR_CONFIGS = {
+    "name": "--oem 1 --psm 7",
+    "student_id": "--oem 1 --psm 7 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-",
+    "dob": "--oem 1 --psm 7 -c tessedit_char_whitelist=0123456789/-.",
+    "phone": "--oem 1 --psm 7 -c tessedit_char_whitelist=0123456789+",
+}
+LINE_OCR_CONFIG = "--oem 1 --psm 7"
+LINE_OCR_MAX = 12
+
+
+def split_label(line: OcrLine, label: re.Pattern) -> tuple[list[OcrWord], list[OcrWord]] | None:
+    # Label words and value words; None when the label ends inside a word
+    # ("Phone:98765..."), where no clean value crop exists.
+    match = label.search(line.text)
+    if not match:
+        return None
+    offset = 0
+    for idx, word in enumerate(line.words):
+        end = offset + len(word.text)
+        if end >= match.end():
+            if line.text[match.end() : end].strip(":-. "):
+                return None
+            return line.words[: idx + 1], line.words[idx + 1 :]
+        offset = end + 1
+    return None
+
+
+def find_field_value(lines: list[OcrLine], name: str) -> tuple[list[OcrWord], list[OcrWord], bool] | None:
+    # (label words, value words, whether the value could be isolated) for the
+    # first line carrying one of the field's labels.
+    labels = dict.fromkeys(rule.label for rule in LABEL_RULES if rule.field == name)
+    for idx, line in enumerate(lines):
+        for label in labels:
+            if not label.search(line.text):
+                continue
+            split = split_label(line, label)
+            if split is None:
+                return [], line.words, False
+            prefix, value = split
+            if value:
+                return prefix, value, True
+            if idx + 1 < len(lines):
+                return [], lines[idx + 1].words, True
+    return None
+
+
+def words_box(words: list[OcrWord]) -> tuple[int, int, int, int]:
+    left = min(word.left for word in words)
+    top = min(word.top for word in words)
+    right = max(word.left + word.width for word in words)
+    bottom = max(word.top + word.height for word in words)
+    # Generous on the right: a misread often clips the last characters.
+    slack = max(2, (bottom - top) // 3)
+    return max(0, left - slack), max(0, top - slack), right + 3 * slack, bottom + slack
+
+
+def box_overlaps(box: tuple[int, int, int, int], line: OcrLine) -> bool:
+    left, top, right, bottom = box
+    shared = min(bottom, line.bottom) - max(top, line.top)
+    if shared < 0.5 * min(bottom - top, line.bottom - line.top):
+        return False
+    return min(right, line.right) > max(left, line.left)
+
+
+def targeted_layout(pipeline: PreprocessPipeline, ocr: OcrResult, missing: list[str]) -> OcrLayout:
+    """Re-read only the lines that matter, as small single-line crops.
+
+    A missing field whose label was found has its value re-read with that
+    field's config and rejoined to the label words, so the merged line
+    replaces the first pass's reading if it is more confident. Text lines
+    the morphology stage finds but the first pass missed are read with
+    PSM 7. Everything comes back as one more layout for the cascade.
+    """
+    lines = ocr.lines
+    jobs: list[OcrJob] = []
+    prefixes: list[list[OcrWord]] = []
+    for name in missing:
+        if name not in FIELD_OCR_CONFIGS:
+            continue
+        found = find_field_value(lines, name)
+        if found is None:
+            continue
+        prefix, value, isolated = found
+        config = FIELD_OCR_CONFIGS[name] if isolated else LINE_OCR_CONFIG
+        if name == "dob" and any(char.isalpha() for word in value for char in word.text):
+            # Month names ("12 Mar 2003") would not survive a digit whitelist.
+            config = LINE_OCR_CONFIG
+        jobs.append(OcrJob(ocr.angle, config, box=words_box(value)))
+        prefixes.append(prefix)
+
+    for box in pipeline.text_lines(ocr.angle):
+        if len(jobs) >= LINE_OCR_MAX:
+            break
+        if not any(box_overlaps(box, line) for line in lines):
+            jobs.append(OcrJob(ocr.angle, LINE_OCR_CONFIG, box=box))
+            prefixes.append([])
+
+    words: list[OcrWord] = []
+    for number, (prefix, data) in enumerate(zip(prefixes, run_ocr_jobs(pipeline, jobs)), start=1):
+        read = OcrLayout.from_data(data).words
+        if read:
+            words.extend(replace(word, block=number, par=0, line=0) for word in [*prefix, *read])
+    return OcrLayout(words=words)
+
+
+def college_recheck_layout(pipeline: PreprocessPipeline, ocr: OcrResult) -> OcrLayout:
+    # Lines the gazetteer nearly matches get a cleaner single-line read, so
+    # one or two crops stand in for re-OCRing the whole header.
+    gazetteer = get_college_gazetteer()
+    jobs = []
+    for line in ocr.lines:
+        found = gazetteer.candidates(line.text, 1, COLLEGE_RECHECK_MIN_SCORE)
+        if found and found[0].score < COLLEGE_MATCH_MIN_SCORE:
+            jobs.append(OcrJob(ocr.angle, LINE_OCR_CONFIG, box=words_box(line.words)))
+    words: list[OcrWord] = []
+    for number, data in enumerate(run_ocr_jobs(pipeline, jobs[:LINE_OCR_MAX]), start=1):
+        words.extend(replace(word, block=number, par=0, line=0) for word in OcrLayout.from_data(data).words)
+    return OcrLayout(words=words)
+
+
+def ocr_cascade(
+    pipeline: PreprocessPipeline,
+    angle: int | None = None,
+    qr_data: str | None = None,
+) -> tuple[OcrResult, str | None, dict]:
+    """Run OCR passes cheapest-first until the required fields are settled.
+
+    Returns the OCR passes, the detected college header and the parsed
+    fields. Targeted line crops, then full-page PSM passes, then crops of
+    lines that nearly match a known college, then the header re-OCR only
+    run while something is still missing or low-confidence. Under a
+    deadline, passes that no longer fit are skipped and the fields found so
+    far are returned.
+    """
+    try:
+        ocr = ocr_best(pipeline, angle)
+    except DeadlineExceeded:
+        ocr = OcrResult()
+    if ocr.layout is None:
+        return ocr, None, extract_fields("", qr_data, None)
+
+    header = best_header(ocr.layout.lines, pipeline.header_cut(ocr.angle))
+    header_text = header.text if header else None
+    fields = extract_fields(ocr.text, qr_data, header_text)
+    missing = unsettled_fields(fields, ocr.layouts)
+
+    if missing:
+        try:
+            targeted = targeted_layout(pipeline, ocr, missing)
+        except DeadlineExceeded:
+            return ocr, header_text, fields
+        if targeted.words:
+            ocr.layouts.append(targeted)
+            fields = extract_fields(ocr.text, qr_data, header_text)
+            missing = unsettled_fields(fields, ocr.layouts)
+
+    for config in CASCADE_CONFIGS:
+        if not missing:
+            break
+        try:
+            data = run_ocr_job(pipeline, OcrJob(ocr.angle, config))
+        except DeadlineExceeded:
+            return ocr, header_text, fields
+        ocr.layouts.append(OcrLayout.from_data(data))
+        fields = extract_fields(ocr.text, qr_data, header_text)
+        missing = unsettled_fields(fields, ocr.layouts)
+
+    # Also when a college was read but matches nothing in the list: a line
+    # that nearly matches is likely a misread of a listed name.
+    if "college" in missing or not fields.get("college_score"):
+        try:
+            recheck = college_recheck_layout(pipeline, ocr)
+        except DeadlineExceeded:
+            return ocr, header_text, fields
+        if recheck.words:
+            ocr.layouts.append(recheck)
+            fields = extract_fields(ocr.text, qr_data, header_text)
+            missing = unsettled_fields(fields, ocr.layouts)
+
+    if "college" in missing:
+        try:
+            header_text = extract_prominent_header(pipeline, ocr.angle, ocr)
+        except DeadlineExceeded:
+            return ocr, header_text, fields
+        fields = extract_fields(ocr.text, qr_data, header_text)
+
+    return ocr, header_text, fields
+
+
+def build_result(
+    ocr_text: str,
+    qr_data: str | None,
+    header_text: str | None,
+    fields: dict,
+    raw_lines: list[dict] | None = None,
+) -> ScanResult:
     return ScanResult(
         raw_text=ocr_text,
+        raw_lines=raw_lines,
         qr_data=qr_data,
+        header_text=header_text,
         name=fields.get("name"),
         hostel_id=fields.get("student_id"),
         hostel=fields.get("hostel"),
@@ -577,41 +2497,942 @@ def scan_image(image_path: str) -> ScanResult:
         dob=fields.get("dob"),
         phone=fields.get("phone"),
         doc_type=fields.get("doc_type"),
+        college_score=fields.get("college_score"),
     )
 
 
+# Bump PIPELINE_VERSION when anything before parse_fields changes what OCR
+# sees or produces; cached entries from other pipeline versions are ignored.
+# Bump PARSER_VERSION when parse_fields/classify_document change; cached OCR
+# is then re-parsed instead of re-running Tesseract.
+PIPELINE_VERSION = 3
+PARSER_VERSION = 6
+
+# Scans hold names, dates of birth and phone numbers, so they live in a
+# per-user data directory rather than the shared temp dir.
+SCAN_DATA_DIR = os.environ.get(
+    "SCAN_DATA_DIR",
+    str(
+        Path(os.environ.get("XDG_DATA_HOME") or os.environ.get("LOCALAPPDATA") or Path.home() / ".local" / "share")
+        / "hostel-verify"
+    ),
+)
+SCAN_CACHE_ENABLED = os.environ.get("SCAN_CACHE", "1") != "0"
+SCAN_CACHE_PATH = os.environ.get("SCAN_CACHE_PATH", str(Path(SCAN_DATA_DIR) / "scan-cache.sqlite3"))
+SCAN_CACHE_MAX_AGE_DAYS = float(os.environ.get("SCAN_CACHE_MAX_AGE_DAYS", "30"))
+SCAN_CACHE_MAX_BYTES = int(os.environ.get("SCAN_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+CARD_HASH_ENABLED = os.environ.get("CARD_HASH", "1") != "0"
+CARD_HASH_INDEX_PATH = os.environ.get("CARD_HASH_INDEX_PATH", str(Path(SCAN_DATA_DIR) / "card-hashes.sqlite3"))
+
+
+def connect_private(path: str) -> sqlite3.Connection:
+    # A new directory is owner-only and the database file always is; SQLite
+    # creates its -wal/-shm files with the database file's permissions.
+    Path(path).parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+    os.close(os.open(path, os.O_RDWR | os.O_CREAT, 0o600))
+    os.chmod(path, 0o600)
+    return sqlite3.connect(path, timeout=30, check_same_thread=False)
+
+
+def image_digest(image: cv2.typing.MatLike) -> str:
+    digest = hashlib.sha256(str(image.shape).encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+class ScanCache:
+    """On-disk cache of OCR passes and parsed fields keyed by image content."""
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._db = connect_private(path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS scans (
+                key TEXT PRIMARY KEY,
+                parser_version INTEGER NOT NULL,
+                qr_data TEXT,
+                header_text TEXT,
+                ocr TEXT NOT NULL,
+                fields TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS scans_accessed_at ON scans (accessed_at)")
+        self._db.commit()
+
+    @staticmethod
+    def key(digest: str) -> str:
+        return f"{digest}:{PIPELINE_VERSION}"
+
+    def get(self, digest: str) -> tuple[OcrResult, str | None, str | None, dict] | None:
+        key = self.key(digest)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT parser_version, qr_data, header_text, ocr, fields FROM scans WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            parser_version, qr_data, header_text, ocr_json, fields_json = row
+            ocr = OcrResult.from_dict(json.loads(ocr_json))
+            if parser_version == PARSER_VERSION:
+                fields = json.loads(fields_json)
+            else:
+                fields = extract_fields(ocr.text, qr_data, header_text)
+                self._db.execute(
+                    "UPDATE scans SET parser_version = ?, fields = ? WHERE key = ?",
+                    (PARSER_VERSION, json.dumps(fields), key),
+                )
+            self._db.execute("UPDATE scans SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+        return ocr, qr_data, header_text, fields
+
+    def put(self, digest: str, ocr: OcrResult, qr_data: str | None, header_text: str | None, fields: dict) -> None:
+        ocr_json = json.dumps(ocr.to_dict())
+        fields_json = json.dumps(fields)
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO scans VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    self.key(digest),
+                    PARSER_VERSION,
+                    qr_data,
+                    header_text,
+                    ocr_json,
+                    fields_json,
+                    len(ocr_json) + len(fields_json),
+                    now,
+                    now,
+                ),
+            )
+            self._evict(now)
+            self._db.commit()
+
+    def _evict(self, now: float) -> None:
+        self._db.execute("DELETE FROM scans WHERE created_at < ?", (now - SCAN_CACHE_MAX_AGE_DAYS * 86400,))
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM scans").fetchone()[0]
+        if total <= SCAN_CACHE_MAX_BYTES:
+            return
+        # Drop least recently used entries until back under the size budget.
+        excess = total - SCAN_CACHE_MAX_BYTES
+        for key, size in self._db.execute("SELECT key, size FROM scans ORDER BY accessed_at").fetchall():
+            if excess <= 0:
+                break
+            self._db.execute("DELETE FROM scans WHERE key = ?", (key,))
+            excess -= size
+
+
+_scan_cache: ScanCache | None = None
+_scan_cache_lock = threading.Lock()
+
+
+def get_scan_cache() -> ScanCache | None:
+    global _scan_cache
+    if not SCAN_CACHE_ENABLED:
+        return None
+    with _scan_cache_lock:
+        if _scan_cache is None:
+            _scan_cache = ScanCache(SCAN_CACHE_PATH)
+        return _scan_cache
+
+
+_card_index = None
+_card_index_lock = threading.Lock()
+
+
+def get_card_index():
+    global _card_index
+    if not CARD_HASH_ENABLED:
+        return None
+    with _card_index_lock:
+        if _card_index is None:
+            _card_index = card_hash_index.CardHashIndex(CARD_HASH_INDEX_PATH)
+        return _card_index
+
+
+def match_card(card: cv2.typing.MatLike, result: ScanResult, card_ref: str | None = None) -> ScanResult:
+    # Reports the closest previously seen cards, leaving out those recorded
+    # under card_ref (the account or file the scan belongs to).
+    index = get_card_index()
+    if index is None:
+        return result
+    with profile_stage("card_hash"):
+        hashes = card_hash_index.rotation_hashes(card)
+        matches = index.nearest(hashes, exclude_ref=card_ref)
+    result.card_hash = hashes[0].hex()
+    result.similar_cards = [asdict(match) for match in matches]
+    return result
+
+
+def record_card(card_hash: str, card_ref: str, student_id: str | None = None) -> bool:
+    # Called once the card's owner is verified rather than on every scan, so
+    # a rejected or abandoned upload never shows up as someone else's card.
+    index = get_card_index()
+    if index is None:
+        return False
+    card = bytes.fromhex(card_hash)
+    if len(card) != card_hash_index.HASH_BYTES:
+        raise RuntimeError("Invalid card hash")
+    index.add(card, card_ref, student_id)
+    return True
+
+
+CAMERA_OCR_INTERVAL = 1.5
+CAMERA_OVERLAY_FIELDS = ("name", "student_id", "dob", "phone", "college")
+CAMERA_STABLE_FRAMES = 3
+CAMERA_QUALITY_SIDE = 480
+CAMERA_MIN_SHARPNESS = 60.0
+CAMERA_MAX_GLARE = 0.08
+
+
+def frame_quality(frame: cv2.typing.MatLike) -> float:
+    # Variance of the Laplacian for focus, share of blown-out pixels for
+    # glare; 0.0 means the frame is not worth OCR'ing at all.
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    scale = CAMERA_QUALITY_SIDE / max(gray.shape[:2])
+    if scale < 1:
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    sharpness = float(cv2.Laplacian(gray, cv2.CV_64F).var())
+    glare = float(np.count_nonzero(gray >= 250)) / gray.size
+    if sharpness < CAMERA_MIN_SHARPNESS or glare > CAMERA_MAX_GLARE:
+        return 0.0
+    return sharpness * (1.0 - 0.5 * glare / CAMERA_MAX_GLARE)
+
+
+class FrameSlot:
+    """Single-slot frame handoff between the capture loop and a worker.
+
+    Publishing replaces the pending frame unless the pending one scored
+    higher, so the worker takes the best frame offered since its last take
+    (with equal scores, simply the newest) and everything else is dropped
+    instead of queueing.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._frame = None
+        self._score = 0.0
+        self._pending = False
+        self._closed = False
+
+    def publish(self, frame: cv2.typing.MatLike, score: float = 0.0) -> None:
+        with self._cond:
+            if self._pending and score < self._score:
+                return
+            self._frame, self._score, self._pending = frame, score, True
+            self._cond.notify_all()
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def take(self) -> cv2.typing.MatLike | None:
+        with self._cond:
+            while not self._closed and not self._pending:
+                self._cond.wait()
+            if self._closed:
+                return None
+            self._pending = False
+            return self._frame
+
+
+def vote_key(value: str) -> str:
+    return re.sub(r"[^A-Z0-9]", "", value.upper())
+
+
+class FieldVotes:
+    """Per-field value votes accumulated across OCR'd camera frames."""
+
+    def __init__(self):
+        self._counts: dict[str, Counter] = {name: Counter() for name in REQUIRED_FIELDS}
+        self._forms: dict[str, dict[str, str]] = {name: {} for name in REQUIRED_FIELDS}
+
+    def add(self, fields: dict) -> None:
+        for name in REQUIRED_FIELDS:
+            value = fields.get(name)
+            if not value or not vote_key(value):
+                continue
+            key = vote_key(value)
+            self._counts[name][key] += 1
+            self._forms[name].setdefault(key, value)
+
+    def leader(self, name: str) -> tuple[str | None, int]:
+        ranked = self._counts[name].most_common(2)
+        if not ranked:
+            return None, 0
+        # A tie for first place is not a winner yet.
+        if len(ranked) == 2 and ranked[0][1] == ranked[1][1]:
+            return None, ranked[0][1]
+        key, count = ranked[0]
+        return self._forms[name][key], count
+
+    def stable(self, frames: int) -> bool:
+        return all(self.leader(name)[1] >= frames and self.leader(name)[0] for name in REQUIRED_FIELDS)
+
+    def resolve(self, fields: dict) -> dict:
+        resolved = dict(fields)
+        for name in REQUIRED_FIELDS:
+            value, _ = self.leader(name)
+            if value:
+                resolved[name] = value
+        return resolved
+
+
+@dataclass
+class CameraState:
+    qr_data: str | None = None
+    ocr_text: str = ""
+    header_text: str | None = None
+    votes: FieldVotes = field(default_factory=FieldVotes)
+    complete: threading.Event = field(default_factory=threading.Event)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+def camera_qr_worker(frames: FrameSlot, state: CameraState) -> None:
+    while (frame := frames.take()) is not None:
+        with profile_stage("qr"):
+            qr_data = decode_qr(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))
+        if qr_data:
+            with state.lock:
+                state.qr_data = qr_data
+
+
+def camera_ocr_worker(frames: FrameSlot, state: CameraState, stop: threading.Event, stable_frames: int) -> None:
+    while (frame := frames.take()) is not None:
+        started = time.time()
+        with state.lock:
+            qr_data = state.qr_data
+        with profile_stage("normalize"):
+            image = normalize_card(frame)
+        pipeline = PreprocessPipeline(image)
+        ocr, header_text, fields = ocr_cascade(pipeline, resolve_orientation(pipeline), qr_data)
+        with state.lock:
+            state.ocr_text = ocr.text
+            state.header_text = header_text
+            state.votes.add(fields)
+            if state.votes.stable(stable_frames):
+                state.complete.set()
+                break
+        if stop.wait(max(0.0, CAMERA_OCR_INTERVAL - (time.time() - started))):
+            break
+
+
+def scan_camera(
+    camera_index: int = 0,
+    stable_frames: int = CAMERA_STABLE_FRAMES,
+    profile: bool = False,
+) -> ScanResult:
+    """Scan from a live camera until every required field is stable.
+
+    Only sharp, glare-free frames are OCR'd (the best one offered between
+    passes), and each pass votes for its field values. Scanning stops on
+    its own once every required field has the same leading value in
+    stable_frames passes, or when Q is pressed. Profiling covers the whole
+    session, with per-stage totals across frames.
+    """
+    with profiling(profile or bool(SCAN_METRICS_FILE), mode="camera") as scan_profile:
+        result = run_camera(camera_index, stable_frames)
+    if scan_profile is not None:
+        timings = scan_profile.summary()
+        if SCAN_METRICS_FILE:
+            record_metrics(timings)
+        if profile:
+            result.timings = timings
+    return result
+
+
+def run_camera(camera_index: int, stable_frames: int) -> ScanResult:
+    cap = cv2.VideoCapture(camera_index)
+    if not cap.isOpened():
+        raise RuntimeError("Unable to open camera")
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+    # QR decoding and OCR run on background threads that pick frames from
+    # their own slots, so this loop only captures, scores and draws.
+    state = CameraState()
+    qr_frames = FrameSlot()
+    ocr_frames = FrameSlot()
+    stop = threading.Event()
+    workers = [
+        threading.Thread(
+            target=contextvars.copy_context().run,
+            args=(camera_qr_worker, qr_frames, state),
+            daemon=True,
+        ),
+        threading.Thread(
+            target=contextvars.copy_context().run,
+            args=(camera_ocr_worker, ocr_frames, state, stop, stable_frames),
+            daemon=True,
+        ),
+    ]
+    for worker in workers:
+        worker.start()
+
+    try:
+        while not state.complete.is_set():
+            with profile_stage("capture"):
+                ret, frame = cap.read()
+            if not ret:
+                break
+            qr_frames.publish(frame)
+            with profile_stage("frame_quality"):
+                quality = frame_quality(frame)
+            if quality > 0:
+                ocr_frames.publish(frame, quality)
+
+            with state.lock:
+                qr_data = state.qr_data
+                leaders = {name: state.votes.leader(name) for name in CAMERA_OVERLAY_FIELDS}
+
+            overlay = frame.copy()
+            cv2.putText(overlay, "Press Q to quit", (16, 28), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 200, 255), 2)
+            y = 60
+            if qr_data:
+                cv2.putText(overlay, f"QR: {qr_data[:40]}", (16, y), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 100), 2)
+                y += 28
+            for name, (value, count) in leaders.items():
+                if value:
+                    text = f"{name}: {value[:40]} ({min(count, stable_frames)}/{stable_frames})"
+                    cv2.putText(overlay, text, (16, y), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 220, 0), 2)
+                    y += 28
+            cv2.imshow("ID Card Scanner", overlay)
+
+            if cv2.waitKey(1) & 0xFF in (ord("q"), ord("Q")):
+                break
+    finally:
+        stop.set()
+        qr_frames.close()
+        ocr_frames.close()
+        cap.release()
+        cv2.destroyAllWindows()
+
+    # Use whatever the workers last finished; an OCR pass still in flight
+    # is not waited for. Voted values win over the last pass's parse.
+    with state.lock:
+        ocr_text, qr_data, header_text = state.ocr_text, state.qr_data, state.header_text
+        fields = state.votes.resolve(extract_fields(ocr_text, qr_data, header_text))
+    return build_result(ocr_text, qr_data, header_text, fields)
+
+
+def scan_image(
+    source: str | bytes,
+    profile: bool = False,
+    deadline_ms: float | Deadline | None = None,
+    card_ref: str | None = None,
+) -> ScanResult:
+    # With profile=True the result carries a timings block; a configured
+    # metrics file gets one record per scan either way. With deadline_ms the
+    # scan returns by then, flagged partial if any work was cut. Cards
+    # recorded under card_ref are left out of similar_cards.
+    with profiling(profile or bool(SCAN_METRICS_FILE)) as scan_profile, deadline_scope(deadline_ms):
+        result = run_scan(source, card_ref)
+        result.partial = deadline_hit()
+    if scan_profile is not None:
+        timings = scan_profile.summary()
+        if SCAN_METRICS_FILE:
+            record_metrics(timings)
+        if profile:
+            result.timings = timings
+    return result
+
+
+def run_scan(source: str | bytes, card_ref: str | None = None) -> ScanResult:
+    with profile_stage("decode"):
+        image = load_image(source)
+
+    cache = get_scan_cache()
+    if cache:
+        with profile_stage("cache"):
+            digest = image_digest(image)
+            cached = cache.get(digest)
+        if cached:
+            ocr, qr_data, header_text, fields = cached
+            result = build_result(ocr.text, qr_data, header_text, fields, ocr.line_confidences())
+            if get_card_index() is None:
+                return result
+            with profile_stage("normalize"):
+                card = normalize_card(image)
+            return match_card(card, result, card_ref)
+
+    with profile_stage("normalize"):
+        image = normalize_card(image)
+    pipeline = PreprocessPipeline(image)
+    gray = pipeline.gray()
+    with profile_stage("qr"):
+        qr_data = decode_qr(gray)
+        qr_fields = parse_qr_payload(qr_data)
+    missing = [name for name in REQUIRED_FIELDS if not qr_fields.get(name)]
+
+    if not missing:
+        # The QR payload alone satisfies verification: no OCR at all.
+        ocr, header_text = OcrResult(), None
+        fields = extract_fields("", qr_data, None)
+    elif missing == ["college"]:
+        # Only the college name is missing: OCR just the header crop.
+        ocr = OcrResult()
+        try:
+            header_text = extract_prominent_header(pipeline, resolve_orientation(pipeline))
+        except DeadlineExceeded:
+            header_text = None
+        fields = extract_fields("", qr_data, header_text)
+    else:
+        ocr, header_text, fields = ocr_cascade(pipeline, resolve_orientation(pipeline), qr_data)
+    # A cut-short scan is not cached, so a retry with more time can do better.
+    if cache and not deadline_hit():
+        with profile_stage("cache"):
+            cache.put(digest, ocr, qr_data, header_text, fields)
+    result = build_result(ocr.text, qr_data, header_text, fields, ocr.line_confidences())
+    return match_card(image, result, card_ref)
+
+
+def result_to_payload(result: ScanResult) -> dict:
+    payload = {
+        "qr_data": result.qr_data,
+        "header_text": result.header_text,
+        "name": result.name,
+        "student_id": result.hostel_id,
+        "college": result.college,
+        "college_score": result.college_score,
+        "hostel": result.hostel,
+        "block": result.block,
+        "floor": result.floor,
+        "room": result.room,
+        "dob": result.dob,
+        "phone": result.phone,
+        "doc_type": result.doc_type,
+        "raw_text": result.raw_text,
+        "raw_lines": result.raw_lines,
+        "partial": result.partial,
+        "card_hash": result.card_hash,
+        "similar_cards": result.similar_cards,
+    }
+    if result.timings is not None:
+        payload["timings"] = result.timings
+    return payload
+
+
+def request_scan_args(request: dict, deadline_ms: float | None = None) -> tuple:
+    profile = bool(request.get("timings"))
+    deadline_ms = request.get("deadline_ms", deadline_ms)
+    card_ref = request.get("card_ref")
+    if request.get("image_b64"):
+        return base64.b64decode(request["image_b64"]), profile, deadline_ms, card_ref
+    image_path = request.get("image")
+    if not image_path:
+        raise RuntimeError("Request is missing 'image' or 'image_b64'")
+    return image_path, profile, deadline_ms, card_ref
+
+
+SCAN_MAX_CONCURRENT = int(os.environ.get("SCAN_MAX_CONCURRENT", "2"))
+SCAN_MAX_QUEUE = int(os.environ.get("SCAN_MAX_QUEUE", "16"))
+
+
+class ScannerOverloaded(RuntimeError):
+    pass
+
+
+class AsyncScanner:
+    """Runs scan_image off the event loop, a bounded number at a time.
+
+    Scans run on a dedicated thread pool of max_concurrent threads (OpenCV
+    releases the GIL and Tesseract runs as subprocesses), and up to
+    max_queue more wait for a thread. Past that, scan() raises
+    ScannerOverloaded at once instead of letting latency grow without
+    bound. A scan's deadline counts from the scan() call, so time spent
+    queued comes out of its budget. Both limits default to
+    SCAN_MAX_CONCURRENT and SCAN_MAX_QUEUE as set when the scanner is
+    created. Cancelling the awaiting task kills the scan's in-flight
+    Tesseract processes and stops it from starting more; its thread slot is
+    freed once the scan has unwound.
+    """
+
+    def __init__(self, max_concurrent: int | None = None, max_queue: int | None = None):
+        self.max_concurrent = max(1, SCAN_MAX_CONCURRENT if max_concurrent is None else max_concurrent)
+        self.max_queue = max(0, SCAN_MAX_QUEUE if max_queue is None else max_queue)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix="scan")
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _release(self, _future=None) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    async def scan(
+        self,
+        source: str | bytes,
+        profile: bool = False,
+        deadline_ms: float | None = None,
+        card_ref: str | None = None,
+    ) -> ScanResult:
+        with self._lock:
+            if self._pending >= self.max_concurrent + self.max_queue:
+                raise ScannerOverloaded(f"Scanner overloaded: {self._pending} scans in flight")
+            self._pending += 1
+        scope = CancelScope()
+        deadline = Deadline(deadline_ms) if deadline_ms else None
+        context = contextvars.copy_context()
+        context.run(_active_cancel.set, scope)
+        try:
+            future = self._executor.submit(context.run, scan_image, source, profile, deadline, card_ref)
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            scope.cancel()
+            raise
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+_async_scanner: AsyncScanner | None = None
+_async_scanner_lock = threading.Lock()
+
+
+def get_async_scanner() -> AsyncScanner:
+    global _async_scanner
+    with _async_scanner_lock:
+        if _async_scanner is None:
+            _async_scanner = AsyncScanner()
+        return _async_scanner
+
+
+async def scan_image_async(
+    source: str | bytes,
+    profile: bool = False,
+    deadline_ms: float | None = None,
+    card_ref: str | None = None,
+) -> ScanResult:
+    # scan_image for asyncio code, through the shared AsyncScanner (sized by
+    # SCAN_MAX_CONCURRENT / SCAN_MAX_QUEUE).
+    return await get_async_scanner().scan(source, profile, deadline_ms, card_ref)
+
+
+async def serve_async(
+    stream_in=sys.stdin,
+    stream_out=sys.stdout,
+    deadline_ms: float | None = None,
+    scanner: AsyncScanner | None = None,
+) -> None:
+    # Requests are scanned concurrently and each response is written when its
+    # scan finishes, so responses pair with requests by id, not by order.
+    # {"id": X, "cancel": true} cancels request X.
+    scanner = scanner or get_async_scanner()
+    loop = asyncio.get_running_loop()
+    tasks: dict = {}
+
+    def respond(response: dict) -> None:
+        stream_out.write(json.dumps(response) + "\n")
+        stream_out.flush()
+
+    async def answer(request_id, request: dict) -> None:
+        try:
+            if "record_card" in request:
+                record = request["record_card"]
+                if not isinstance(record, dict) or not record.get("card_hash") or not record.get("card_ref"):
+                    raise RuntimeError("record_card needs 'card_hash' and 'card_ref'")
+                recorded = await loop.run_in_executor(
+                    None, record_card, record["card_hash"], record["card_ref"], record.get("student_id")
+                )
+                response = {"id": request_id, "ok": True, "result": {"recorded": recorded}}
+            else:
+                result = await scanner.scan(*request_scan_args(request, deadline_ms))
+                response = {"id": request_id, "ok": True, "result": result_to_payload(result)}
+        except asyncio.CancelledError:
+            response = {"id": request_id, "ok": False, "error": "Scan cancelled"}
+        except Exception as exc:
+            response = {"id": request_id, "ok": False, "error": str(exc) or exc.__class__.__name__}
+        tasks.pop(request_id, None)
+        respond(response)
+
+    while True:
+        line = await loop.run_in_executor(None, stream_in.readline)
+        if not line:
+            break
+        line = line.strip()
+        if not line:
+            continue
+        request_id = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise RuntimeError("Request must be a JSON object")
+            request_id = request.get("id")
+        except Exception as exc:
+            respond({"id": request_id, "ok": False, "error": str(exc) or exc.__class__.__name__})
+            continue
+        if request.get("cancel"):
+            task = tasks.get(request_id)
+            if task:
+                task.cancel()
+            continue
+        tasks[request_id] = loop.create_task(answer(request_id, request))
+    if tasks:
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+
+def serve(stream_in=sys.stdin, stream_out=sys.stdout, deadline_ms: float | None = None) -> None:
+    # A failing request only produces an error response; the process keeps
+    # serving so imports and the Tesseract lookup are paid once.
+    asyncio.run(serve_async(stream_in, stream_out, deadline_ms))
+
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp", ".webp", ".tif", ".tiff"}
+
+
+def parse_manifest_line(line: str) -> dict:
+    # A bare path or a JSON object with an "image" key.
+    try:
+        entry = json.loads(line) if line.startswith("{") else {"image": line}
+    except ValueError:
+        raise RuntimeError("Manifest line is not valid JSON") from None
+    if not isinstance(entry, dict) or not isinstance(entry.get("image"), str) or not entry["image"]:
+        raise RuntimeError("Manifest line has no 'image'")
+    return entry
+
+
+def iter_batch_images(source: str):
+    """Yield (image path, error) pairs from a directory tree or a manifest.
+
+    A manifest lists one image per line, either as a bare path or as a JSON
+    object with an "image" key; relative paths are resolved against the
+    manifest's directory. A line naming no image is yielded as itself with
+    an error, so it is reported like an unreadable image. Paths are yielded
+    lazily, one directory listing at a time, so huge batches are never held
+    in memory.
+    """
+    root = Path(source)
+    if root.is_dir():
+        for directory, subdirs, files in os.walk(root):
+            subdirs.sort()
+            for filename in sorted(files):
+                if Path(filename).suffix.lower() in IMAGE_SUFFIXES:
+                    yield os.path.join(directory, filename), None
+        return
+
+    if not root.exists():
+        raise RuntimeError("Batch source not found")
+    with root.open(encoding="utf-8") as manifest:
+        for line in manifest:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                path = Path(parse_manifest_line(line)["image"])
+            except RuntimeError as exc:
+                yield line, str(exc)
+                continue
+            yield str(path if path.is_absolute() else root.parent / path), None
+
+
+def configure_batch_worker(write_metrics: bool) -> None:
+    global SCAN_METRICS_FILE
+    configure_ocr_workers(1)
+    if not write_metrics:
+        SCAN_METRICS_FILE = None
+
+
+def scan_batch_item(image_path: str, profile: bool = False, deadline_ms: float | None = None) -> dict:
+    try:
+        result = scan_image(image_path, profile, deadline_ms)
+        return {"image": image_path, "ok": True, "result": result_to_payload(result)}
+    except Exception as exc:
+        return {"image": image_path, "ok": False, "error": str(exc) or exc.__class__.__name__}
+
+
+def run_batch(
+    source: str,
+    workers: int,
+    profile: bool = False,
+    deadline_ms: float | None = None,
+    stream_out=sys.stdout,
+    stream_err=sys.stderr,
+) -> dict:
+    # Each worker process scans one image at a time with sequential OCR, so
+    # the pool size is the whole CPU budget. At most 2 * workers images are
+    # in flight, which keeps memory flat regardless of batch size.
+    started = time.perf_counter()
+    total = 0
+    failed = 0
+    errors: dict[str, int] = {}
+    images = iter_batch_images(source)
+    # Workers append JSONL records themselves, but a prom snapshot must have
+    # one writer: workers hand their timings back and the parent records them.
+    parent_metrics = bool(SCAN_METRICS_FILE) and SCAN_METRICS_FORMAT == "prom"
+
+    def emit(item: dict) -> None:
+        nonlocal total, failed
+        total += 1
+        if not item["ok"]:
+            failed += 1
+            errors[item["error"]] = errors.get(item["error"], 0) + 1
+        elif parent_metrics:
+            result = item["result"]
+            record_metrics(result["timings"] if profile else result.pop("timings"))
+        stream_out.write(json.dumps(item) + "\n")
+        stream_out.flush()
+
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=configure_batch_worker, initargs=(not parent_metrics,)
+    ) as pool:
+        pending = set()
+        for image_path, error in images:
+            if error:
+                emit({"image": image_path, "ok": False, "error": error})
+                continue
+            pending.add(pool.submit(scan_batch_item, image_path, profile or parent_metrics, deadline_ms))
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    emit(future.result())
+        for future in as_completed(pending):
+            emit(future.result())
+
+    elapsed = time.perf_counter() - started
+    summary = {
+        "images": total,
+        "succeeded": total - failed,
+        "failed": failed,
+        "seconds": round(elapsed, 3),
+        "images_per_second": round(total / elapsed, 3) if elapsed > 0 else 0.0,
+        "errors": errors,
+    }
+    stream_err.write(json.dumps({"summary": summary}) + "\n")
+    stream_err.flush()
+    return summary
+
+
+REPARSE_PASSTHROUGH_KEYS = ("id", "image")
+
+
+def reparse_text(raw_text: str, qr_data: str | None = None, header_text: str | None = None) -> ScanResult:
+    fields = extract_fields(raw_text, qr_data, header_text)
+    return build_result(raw_text, qr_data, header_text, fields)
+
+
+def reparse_record(record: dict) -> dict:
+    # Accepts a stored scan payload or a batch output line, whose payload
+    # sits under "result"; ids and image paths are passed through.
+    stored = record.get("result") if isinstance(record.get("result"), dict) else record
+    raw_text = stored.get("raw_text")
+    if not isinstance(raw_text, str):
+        raise RuntimeError("Record has no 'raw_text'")
+    result = reparse_text(raw_text, stored.get("qr_data"), stored.get("header_text"))
+    result.raw_lines = stored.get("raw_lines")
+    item = {key: record[key] for key in REPARSE_PASSTHROUGH_KEYS if key in record}
+    item.update(ok=True, result=result_to_payload(result))
+    return item
+
+
+def run_reparse(stream_in=sys.stdin, stream_out=sys.stdout) -> int:
+    # Pure text work: no image library is imported, and output is only
+    # flushed by the stream's own buffering, so large archives stream fast.
+    count = 0
+    for number, line in enumerate(stream_in, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise RuntimeError("Record must be a JSON object")
+            item = reparse_record(record)
+        except Exception as exc:
+            item = {"line": number, "ok": False, "error": str(exc) or exc.__class__.__name__}
+        stream_out.write(json.dumps(item) + "\n")
+        count += 1
+    stream_out.flush()
+    return count
+
+
+def print_payload(payload: dict, raw_text: str) -> None:
+    print("\n--- Scan Result ---")
+    for key, value in payload.items():
+        if key == "raw_text":
+            continue
+        print(f"{key}: {value}")
+    print("\nRaw OCR:\n", raw_text)
+
+
+def option_value(args: list[str], name: str, default: str | None = None) -> str | None:
+    if name not in args:
+        return default
+    idx = args.index(name)
+    return args[idx + 1] if idx + 1 < len(args) else ""
+
+
 if __name__ == "__main__":
     args = sys.argv[1:]
-    if "--image" in args:
-        idx = args.index("--image")
-        image_path = args[idx + 1] if idx + 1 < len(args) else ""
-        result = scan_image(image_path)
-        payload = {
-            "qr_data": result.qr_data,
-            "name": result.name,
-            "student_id": result.hostel_id,
-            "college": result.college,
-            "hostel": result.hostel,
-            "block": result.block,
-            "floor": result.floor,
-            "room": result.room,
-            "dob": result.dob,
-            "phone": result.phone,
-            "doc_type": result.doc_type,
-            "raw_text": result.raw_text,
-        }
+    workers = option_value(args, "--workers")
+    profile = "--timings" in args
+    deadline_ms = float(option_value(args, "--deadline-ms")) if "--deadline-ms" in args else None
+    # Exported too, so spawn-started batch workers see them.
+    if "--no-cache" in args:
+        SCAN_CACHE_ENABLED = False
+        os.environ["SCAN_CACHE"] = "0"
+    if "--no-card-hash" in args:
+        CARD_HASH_ENABLED = False
+        os.environ["CARD_HASH"] = "0"
+    if "--max-concurrent" in args:
+        SCAN_MAX_CONCURRENT = int(option_value(args, "--max-concurrent"))
+    if "--max-queue" in args:
+        SCAN_MAX_QUEUE = int(option_value(args, "--max-queue"))
+    if "--metrics-file" in args:
+        # Exported too, so batch worker processes append to the same file
+        # (a prom snapshot is written by the batch parent alone).
+        SCAN_METRICS_FILE = os.environ["SCAN_METRICS_FILE"] = option_value(args, "--metrics-file")
+    if "--ocr-backend" in args:
+        # Exported too, so batch worker processes use the same backend.
+        configure_ocr_backend(option_value(args, "--ocr-backend"))
+        os.environ["OCR_BACKEND"] = OCR_BACKEND
+    if "--metrics-format" in args:
+        SCAN_METRICS_FORMAT = os.environ["SCAN_METRICS_FORMAT"] = option_value(args, "--metrics-format")
+    # In batch mode --workers sizes the process pool instead.
+    if workers and "--batch" not in args:
+        configure_ocr_workers(int(workers))
+
+    if "--batch" in args:
+        run_batch(option_value(args, "--batch"), int(workers) if workers else os.cpu_count() or 1, profile, deadline_ms)
+    elif "--serve" in args:
+        serve(deadline_ms=deadline_ms)
+    elif "--reparse-jsonl" in args:
+        source = option_value(args, "--reparse-jsonl")
+        if source == "-":
+            run_reparse()
+        else:
+            with open(source, encoding="utf-8") as stream:
+                run_reparse(stream)
+    elif "--image" in args or "--text" in args:
+        if "--text" in args:
+            text_path = option_value(args, "--text")
+            raw_text = sys.stdin.read() if text_path == "-" else Path(text_path).read_text(encoding="utf-8")
+            result = reparse_text(raw_text)
+        else:
+            image_path = option_value(args, "--image")
+            source = sys.stdin.buffer.read() if image_path == "-" else image_path
+            result = scan_image(source, profile, deadline_ms, option_value(args, "--card-ref"))
+        payload = result_to_payload(result)
         if "--json" in args:
             print(json.dumps(payload))
         else:
-            print("\n--- Scan Result ---")
-            for key, value in payload.items():
-                if key == "raw_text":
-                    continue
-                print(f"{key}: {value}")
-            print("\nRaw OCR:\n", result.raw_text)
+            print_payload(payload, result.raw_text)
     else:
-        cam_index = int(args[0]) if len(args) > 0 else 0
-        result = scan_camera(cam_index)
+        cam_index = int(args[0]) if args and args[0].isdigit() else 0
+        result = scan_camera(cam_index, profile=profile)
         print("\n--- Scan Result ---")
         print("QR Data:", result.qr_data)
         print("Name:", result.name)
@@ -622,3 +3443,5 @@ if __name__ == "__main__":
         print("Floor:", result.floor)
         print("Room:", result.room)
         print("\nRaw OCR:\n", result.raw_text)
+        if result.timings:
+            print("\nTimings:\n", json.dumps(result.timings, indent=2))
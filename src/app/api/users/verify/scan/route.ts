@@ -3,9 +3,8 @@ import { getServerSession } from "next-auth";
 import { authOptions } from "@/lib/auth";
 import dbConnect from "@/lib/db";
 import User from "@/models/User";
-import { spawn } from "child_process";
-import { mkdir, writeFile, unlink } from "fs/promises";
-import { tmpdir } from "os";
+import mongoose from "mongoose";
+import { spawn, type ChildProcessWithoutNullStreams } from "child_process";
 import path from "path";
 import { existsSync } from "fs";
 
@@ -41,6 +40,56 @@ const hasAcademicSignals = (rawText: string | undefined) => {
   return /(branch|department|semester|student\s*id|reg\s*no|registration|usn|roll\s*no|acd\s*yr|academic\s*year)/i.test(rawText);
 };
 
+// OCR confuses these letters with digits, so IDs are compared in one form.
+const normalizeStudentId = (value: string) =>
+  value
+    .toUpperCase()
+    .replace(/[^A-Z0-9]/g, "")
+    .replace(/O/g, "0")
+    .replace(/[IL]/g, "1")
+    .replace(/S/g, "5")
+    .replace(/B/g, "8");
+
+const editDistance = (a: string, b: string) => {
+  let previous = Array.from({ length: b.length + 1 }, (_, index) => index);
+  for (let i = 1; i <= a.length; i++) {
+    const current = [i];
+    for (let j = 1; j <= b.length; j++) {
+      current[j] = Math.min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (a[i - 1] === b[j - 1] ? 0 : 1));
+    }
+    previous = current;
+  }
+  return previous[b.length];
+};
+
+// Classmates' roll numbers differ by a digit, so IDs must agree exactly
+// once letter/digit confusions are folded; near misses prove nothing.
+const isStudentIdMatch = (a?: string | null, b?: string | null) => {
+  if (!a || !b) return false;
+  const aa = normalizeStudentId(a);
+  return !!aa && aa === normalizeStudentId(b);
+};
+
+const nameTokens = (value: string) =>
+  value
+    .toLowerCase()
+    .replace(/[^a-z\s]/g, " ")
+    .split(/\s+/)
+    .filter((token) => token.length > 1);
+
+// Two names match when they share two tokens (one for single-word names),
+// allowing a misread letter in longer tokens; a shared surname is not enough.
+const isNameMatch = (a?: string | null, b?: string | null) => {
+  if (!a || !b) return false;
+  const aa = nameTokens(a);
+  const bb = nameTokens(b);
+  if (!aa.length || !bb.length) return false;
+  const hits = aa.filter((token) =>
+    bb.some((other) => token === other || (token.length >= 5 && editDistance(token, other) <= 1))
+  );
+  return hits.length >= Math.min(2, aa.length, bb.length);
+};
+
 const isCollegeLowQuality = (value: string | undefined) => {
   if (!value) return true;
   const cleaned = value.toLowerCase().replace(/[^a-z\s]/g, " ").replace(/\s+/g, " ").trim();
@@ -51,43 +100,155 @@ const isCollegeLowQuality = (value: string | undefined) => {
   return false;
 };
 
-const runPythonScan = async (imagePath: string) => {
+type PendingScan = {
+  resolve: (value: any) => void;
+  reject: (error: Error) => void;
+};
+
+interface ScannerDaemon {
+  child: ChildProcessWithoutNullStreams;
+  pending: Map<number, PendingScan>;
+  nextId: number;
+}
+
+declare global {
+  // eslint-disable-next-line no-var
+  var idScannerDaemon: ScannerDaemon | undefined;
+}
+
+const resolvePythonPath = () => {
   const venvRoot = process.env.VIRTUAL_ENV || path.join(process.cwd(), ".venv");
   const venvPython = path.join(venvRoot, "Scripts", "python.exe");
   const fallbackPython = "python";
   const candidates = [process.env.PYTHON_PATH, venvPython, fallbackPython].filter(Boolean) as string[];
-  const pythonPath = candidates.find((candidate) => candidate === fallbackPython || existsSync(candidate)) || fallbackPython;
+  return candidates.find((candidate) => candidate === fallbackPython || existsSync(candidate)) || fallbackPython;
+};
+
+// The scanner runs as a long-lived `--serve` process so OpenCV, pyzbar and
+// Tesseract are loaded once instead of on every upload. It scans several
+// requests at once and answers in completion order, matched up by id.
+const getScannerDaemon = () => {
+  const current = global.idScannerDaemon;
+  if (current && current.child.exitCode === null && !current.child.killed) {
+    return current;
+  }
+
   const scriptPath = path.join(process.cwd(), "scripts", "id_card_scanner.py");
+  const child = spawn(resolvePythonPath(), [scriptPath, "--serve"], {
+    env: process.env,
+  });
+  const daemon: ScannerDaemon = { child, pending: new Map(), nextId: 1 };
 
-  const result = await new Promise<string>((resolve, reject) => {
-    const child = spawn(pythonPath, [scriptPath, "--image", imagePath, "--json"], {
-      env: process.env,
-    });
+  let buffered = "";
+  child.stdout.on("data", (data) => {
+    buffered += data.toString();
+    let newline = buffered.indexOf("\n");
+    while (newline !== -1) {
+      const line = buffered.slice(0, newline).trim();
+      buffered = buffered.slice(newline + 1);
+      newline = buffered.indexOf("\n");
+      if (!line) continue;
+
+      let message: any;
+      try {
+        message = JSON.parse(line);
+      } catch {
+        console.error("Unexpected OCR scanner output:", line);
+        continue;
+      }
+      const pending = daemon.pending.get(message.id);
+      if (!pending) continue;
+      daemon.pending.delete(message.id);
+      if (message.ok) {
+        pending.resolve(message.result);
+      } else {
+        pending.reject(new Error(message.error || "Failed to run OCR"));
+      }
+    }
+  });
 
-    let output = "";
-    let errorOutput = "";
+  child.stderr.on("data", (data) => {
+    console.error("OCR scanner:", data.toString());
+  });
 
-    child.stdout.on("data", (data) => {
-      output += data.toString();
-    });
+  const failPending = (error: Error) => {
+    daemon.pending.forEach((pending) => pending.reject(error));
+    daemon.pending.clear();
+    if (global.idScannerDaemon === daemon) {
+      global.idScannerDaemon = undefined;
+    }
+  };
+  child.on("error", (error) => failPending(error));
+  child.on("close", (code) => failPending(new Error(`OCR scanner exited with code ${code}`)));
+  // Writing to a daemon that just died raises EPIPE on stdin; unhandled, it
+  // would take down the whole server.
+  child.stdin.on("error", (error) => failPending(error));
 
-    child.stderr.on("data", (data) => {
-      errorOutput += data.toString();
-    });
+  global.idScannerDaemon = daemon;
+  return daemon;
+};
 
-    child.on("error", (error) => reject(error));
-    child.on("close", (code) => {
-      if (code !== 0) {
-        reject(new Error(errorOutput || "Failed to run OCR"));
-      } else {
-        resolve(output.trim());
+// The scanner returns whatever it has by the deadline (flagged `partial`);
+// the grace period only covers decoding and the round trip.
+const SCAN_DEADLINE_MS = Number(process.env.SCAN_DEADLINE_MS) || 8000;
+const SCAN_TIMEOUT_GRACE_MS = 4000;
+
+// Perceptual-hash distance (out of 256 bits) under which a previously seen
+// card is a candidate for the same physical card. The hash alone cannot
+// decide: on synthetic cards of one template, different students came as
+// close as 8 bits (0.2% of pairs within 12, 5% within 24), while the same
+// card cropped 6px differently lands at a median of 11 and a p95 of 22.
+// The threshold covers those same-card shifts; a candidate only blocks
+// verification when its student ID or owner's name corroborates it.
+const CARD_DUPLICATE_MAX_DISTANCE = Number(process.env.CARD_DUPLICATE_MAX_DISTANCE) || 24;
+
+const sendScannerRequest = (message: Record<string, unknown>) => {
+  const daemon = getScannerDaemon();
+  const id = daemon.nextId++;
+
+  return new Promise<any>((resolve, reject) => {
+    const timer = setTimeout(() => {
+      if (daemon.pending.delete(id)) {
+        // Frees the daemon's slot and kills the scan's Tesseract processes.
+        daemon.child.stdin.write(JSON.stringify({ id, cancel: true }) + "\n");
+        reject(new Error("OCR scanner timed out"));
+      }
+    }, SCAN_DEADLINE_MS + SCAN_TIMEOUT_GRACE_MS);
+    daemon.pending.set(id, {
+      resolve: (value) => {
+        clearTimeout(timer);
+        resolve(value);
+      },
+      reject: (error) => {
+        clearTimeout(timer);
+        reject(error);
+      },
+    });
+    daemon.child.stdin.write(JSON.stringify({ id, ...message }) + "\n", (error) => {
+      if (error && daemon.pending.delete(id)) {
+        clearTimeout(timer);
+        reject(error);
       }
     });
   });
-
-  return JSON.parse(result);
 };
 
+// Image bytes travel inline in the request, so uploads never touch disk.
+// The account's own earlier cards (cardRef) are left out of similar_cards.
+const runPythonScan = (image: Buffer, cardRef: string) =>
+  sendScannerRequest({
+    image_b64: image.toString("base64"),
+    deadline_ms: SCAN_DEADLINE_MS,
+    card_ref: cardRef,
+  });
+
+// Only verified accounts' cards go into the hash index, so a rejected or
+// abandoned upload is never reported as somebody else's card.
+const recordCard = (cardHash: string, cardRef: string, studentId: string) =>
+  sendScannerRequest({
+    record_card: { card_hash: cardHash, card_ref: cardRef, student_id: studentId },
+  });
+
 export async function POST(request: NextRequest) {
   try {
     const session = await getServerSession(authOptions);
@@ -104,18 +265,12 @@ export async function POST(request: NextRequest) {
     }
 
     const buffer = Buffer.from(await file.arrayBuffer());
-    const tempDir = path.join(tmpdir(), "hostel-verify");
-    await mkdir(tempDir, { recursive: true });
-
-    const filePath = path.join(tempDir, `${Date.now()}-${file.name}`);
-    await writeFile(filePath, buffer);
-
-    let scanResult: any = null;
-    try {
-      scanResult = await runPythonScan(filePath);
-    } finally {
-      await unlink(filePath).catch(() => undefined);
-    }
+    // Matches carry other accounts' ids, so they never go back to the client.
+    const {
+      similar_cards: similarCards,
+      card_hash: cardHash,
+      ...scanResult
+    }: any = await runPythonScan(buffer, String(session.user.id));
 
     const scannedCollege = scanResult?.college || "";
     if (scanResult?.doc_type !== "college_id") {
@@ -132,7 +287,14 @@ export async function POST(request: NextRequest) {
     const academicSignals = hasAcademicSignals(scanResult?.raw_text);
     const lowQualityCollege = isCollegeLowQuality(scannedCollege);
 
-    if ((lowQualityCollege || !scannedCollege) && scanResult?.doc_type === "college_id" && (collegeEvidence || academicSignals)) {
+    // A college snapped to the canonical list (college_score set) is what the
+    // card says; only a free-text read may fall back to the signup college.
+    if (
+      !scanResult?.college_score &&
+      (lowQualityCollege || !scannedCollege) &&
+      scanResult?.doc_type === "college_id" &&
+      (collegeEvidence || academicSignals)
+    ) {
       scanResult.college = session.user.college;
     }
 
@@ -149,7 +311,9 @@ export async function POST(request: NextRequest) {
     if (!scanResult?.name || !scanResult?.dob || !scanResult?.phone || !scanResult?.student_id) {
       return NextResponse.json(
         {
-          error: "Missing required fields (name, DOB, phone, student ID). Use a clearer image.",
+          error: scanResult?.partial
+            ? "Scanning took too long to read every field (name, DOB, phone, student ID). Try a clearer image."
+            : "Missing required fields (name, DOB, phone, student ID). Use a clearer image.",
           scanResult,
         },
         { status: 400 }
@@ -170,17 +334,66 @@ export async function POST(request: NextRequest) {
       );
     }
 
+    // Catches the same card re-used even when OCR read the ID differently.
+    // Bulk-indexed cards may carry file paths as refs; only account ids count.
+    const candidates = (similarCards || []).filter(
+      (card: any) => mongoose.isValidObjectId(card.ref) && card.distance <= CARD_DUPLICATE_MAX_DISTANCE
+    );
+    if (candidates.length) {
+      const owners = await User.find({
+        _id: { $in: candidates.map((card: any) => card.ref), $ne: session.user.id },
+        isVerified: true,
+      }).select("_id name");
+      const ownerNames = new Map(owners.map((owner) => [String(owner._id), owner.name]));
+      const owned = candidates.filter((card: any) => ownerNames.has(card.ref));
+      // A look-alike card only counts as reuse if the card's details agree
+      // too; otherwise it is left for manual review rather than rejected.
+      const reused = owned.some(
+        (card: any) =>
+          isStudentIdMatch(card.student_id, scanResult.student_id) ||
+          isNameMatch(ownerNames.get(card.ref), scanResult.name)
+      );
+      if (reused) {
+        return NextResponse.json(
+          { error: "This ID card appears to be linked to another account.", scanResult },
+          { status: 409 }
+        );
+      }
+      if (owned.length) {
+        console.warn(
+          `ID card verified for account ${session.user.id} resembles the card of verified account(s) ` +
+            `${owned.map((card: any) => `${card.ref} (distance ${card.distance})`).join(", ")}; flag for manual review.`
+        );
+      }
+    }
+
     const updated = await User.findByIdAndUpdate(
       session.user.id,
       { studentId: scanResult.student_id, isVerified: true },
       { new: true }
     ).select("name email studentId isVerified role college");
 
+    if (cardHash) {
+      try {
+        await recordCard(cardHash, String(session.user.id), scanResult.student_id);
+      } catch (error) {
+        // The account is verified either way; the card is just not indexed.
+        console.error("Failed to record ID card hash:", error);
+      }
+    }
+
     return NextResponse.json({
       user: updated,
       scanResult,
     });
   } catch (error) {
+    // The daemon sheds load instead of queueing scans without bound.
+    if (error instanceof Error && error.message.startsWith("Scanner overloaded")) {
+      return NextResponse.json(
+        { error: "Too many ID cards are being scanned right now. Try again in a moment." },
+        { status: 503 }
+      );
+    }
     console.error("Error scanning ID card:", error);
     return NextResponse.json(
       { error: "Failed to scan ID card. Ensure Python OCR is installed." },